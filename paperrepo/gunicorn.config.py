@@ -4,11 +4,39 @@ backlog = 2048
 
 # Worker processes
 workers = 1    
-worker_class = "sync"
+# Chat answers (get_answer) and semantic search results (paper_list_stream)
+# are streamed as server-sent events. With sync workers each stream would
+# hold the whole process and be killed after `timeout`; gthread serves other
+# requests on the remaining threads, and its timeout only covers the
+# worker's heartbeat, not a request's duration.
+worker_class = "gthread"
+threads = 8
 timeout = 30
 keepalive = 2
 
 # Logging
 accesslog = "-"
 errorlog = "-"
-loglevel = "info"
\ No newline at end of file
+loglevel = "info"
+
+def post_worker_init(worker):
+    # Build the per-process autocomplete index before the first keystroke
+    try:
+        from utils.autocomplete_index import get_index
+        get_index()
+    except Exception as e:
+        worker.log.warning(f"Autocomplete index warm-up failed: {e}")
+
+    # Load the optional cross-encoder now rather than on the first search
+    try:
+        from utils.rerank import warm_up
+        warm_up()
+    except Exception as e:
+        worker.log.warning(f"Reranker warm-up failed: {e}")
+
+    # Replay popular searches into this worker's (locmem) caches
+    try:
+        from utils import cache_warmup
+        cache_warmup.start()
+    except Exception as e:
+        worker.log.warning(f"Search cache warm-up failed: {e}")
@@ -43,6 +43,7 @@ class PaperForm(forms.ModelForm):
     file = forms.FileField(
         label="Upload Paper File",
         help_text="Accepted formats: .pdf, .docx, .chm",
+        required=False,
         widget=ClearableFileInput(attrs={
             'class': FILE_INPUT_CLASSES,
             'id': 'file-upload',
@@ -91,6 +92,10 @@ class PaperForm(forms.ModelForm):
         })
     )
 
+    # Set by the metadata preview step; lets the final upload attach the
+    # already-staged file instead of sending it again.
+    upload_token = forms.CharField(required=False, widget=forms.HiddenInput())
+
     # --- Meta Class ---
     # This connects the form to the model and defines the base widgets
     # for fields we *didn't* override above (like college and program).
@@ -110,6 +115,12 @@ class PaperForm(forms.ModelForm):
     #     self.helper = FormHelper()
     #     ... (all crispy_forms logic removed) ...
 
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('file') and not cleaned_data.get('upload_token'):
+            self.add_error('file', "Please upload a paper file.")
+        return cleaned_data
+
     def clean_authors(self):
         raw = self.cleaned_data['authors']
         lines = raw.strip().splitlines()
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from papers.models import Paper, PaperChunk
 from utils.semantic_search import index_paper  # <-- your existing function
+from utils.bm25 import delete_chunks
 
 class Command(BaseCommand):
     help = "Extract, chunk, embed, and index ALL papers in the database."
@@ -15,7 +16,7 @@ class Command(BaseCommand):
             self.stdout.write(f"[{i}/{len(papers)}] Indexing: {paper.title}")
 
             # Delete old chunks for this paper
-            PaperChunk.objects.filter(paper=paper).delete()
+            delete_chunks(PaperChunk.objects.filter(paper=paper))
 
             try:
                 index_paper(paper)
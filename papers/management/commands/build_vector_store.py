@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from utils import vector_store
+
+
+class Command(BaseCommand):
+    help = "Export chunk embeddings into the memory-mapped NumPy vector store."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--collections", nargs="+", choices=vector_store.COLLECTIONS,
+            default=list(vector_store.COLLECTIONS),
+            help="Collections to (re)build (default: all)",
+        )
+        parser.add_argument(
+            "--dtype", choices=["float32", "float16"], default="float32",
+            help="Storage precision; float16 halves memory at a small recall cost",
+        )
+        parser.add_argument(
+            "--ivf-lists", type=int, default=0,
+            help="IVF lists for the chunks collection (0 = exact scan)",
+        )
+        parser.add_argument(
+            "--compact", action="store_true",
+            help="Fold the incremental delta and tombstones into the main matrix "
+                 "instead of re-exporting from the database",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Vector store directory: {vector_store.store_dir()}")
+        for name in options["collections"]:
+            if options["compact"]:
+                count = vector_store.compact(name)
+                if count is None:
+                    self.stdout.write(self.style.WARNING(f"{name}: not built yet, skipping"))
+                    continue
+            else:
+                ivf_lists = options["ivf_lists"] if name == "chunks" else 0
+                count = vector_store.export_collection(name, dtype=options["dtype"], ivf_lists=ivf_lists)
+            self.stdout.write(self.style.SUCCESS(f"✓ {name}: {count} vectors"))
@@ -1,5 +1,8 @@
 from django.core.management.base import BaseCommand
 from papers.models import PaperChunk  # adjust to your model path
+from utils.search_cache import bump_index_generation
+from utils.bm25 import delete_chunks
+from utils.semantic_search import update_paper_centroids
 
 class Command(BaseCommand):
     help = "Deletes all PaperChunk entries with text shorter than 5 words."
@@ -19,13 +22,19 @@ class Command(BaseCommand):
             return
 
         # Delete them
-        PaperChunk.objects.filter(id__in=ids).delete()
+        paper_ids = {chunk.paper_id for chunk in short_chunks}
+        delete_chunks(PaperChunk.objects.filter(id__in=ids))
+        update_paper_centroids(paper_ids)
+        bump_index_generation()
 
         self.stdout.write(
             self.style.WARNING(f"🧹 Deleted {count} chunks out of {total} that had fewer than 5 words.")
         )
 from django.core.management.base import BaseCommand
 from papers.models import PaperChunk  # adjust to your model path
+from utils.search_cache import bump_index_generation
+from utils.bm25 import delete_chunks
+from utils.semantic_search import update_paper_centroids
 
 class Command(BaseCommand):
     help = "Deletes all PaperChunk entries with text shorter than 5 words."
@@ -45,7 +54,10 @@ class Command(BaseCommand):
             return
 
         # Delete them
-        PaperChunk.objects.filter(id__in=ids).delete()
+        paper_ids = {chunk.paper_id for chunk in short_chunks}
+        delete_chunks(PaperChunk.objects.filter(id__in=ids))
+        update_paper_centroids(paper_ids)
+        bump_index_generation()
 
         self.stdout.write(
             self.style.WARNING(f"🧹 Deleted {count} chunks out of {total} that had fewer than 5 words.")
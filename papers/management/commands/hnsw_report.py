@@ -0,0 +1,151 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from papers.models import Paper, PaperChunk
+from staff.utils import get_search_settings
+from utils.semantic_search import _vector_literal, configure_ann_scan
+
+HNSW_INDEX_NAME = "paperchunk_embedding_hnsw_idx"
+# Built next to the live index, then swapped in by rename
+REBUILD_INDEX_NAME = f"{HNSW_INDEX_NAME}_rebuild"
+
+ANN_SQL = """
+    SELECT id FROM papers_paperchunk
+    ORDER BY embedding <=> %s::vector
+    LIMIT %s
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure recall@k and latency of the chunk HNSW index against exact scans "
+        "for several ef_search values."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--samples", type=int, default=50, help="Number of sampled queries")
+        parser.add_argument("--k", type=int, default=10, help="Neighbours compared per query")
+        parser.add_argument(
+            "--ef-search", type=int, nargs="+",
+            help="ef_search values to test (default: 20 40 80 160 and the configured value)",
+        )
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Rebuild the HNSW index with SearchSettings.hnsw_m / hnsw_ef_construction first",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        search_settings = get_search_settings()
+        k = options["k"]
+
+        if options["rebuild"]:
+            self.rebuild_index(search_settings.hnsw_m, search_settings.hnsw_ef_construction)
+
+        queries = self.sample_queries(options["samples"])
+        if not queries:
+            self.stdout.write(self.style.WARNING("No embeddings to sample queries from."))
+            return
+
+        ef_values = options["ef_search"] or sorted({20, 40, 80, 160, search_settings.hnsw_ef_search})
+
+        exact, exact_times = [], []
+        for vec in queries:
+            ids, elapsed = self.run_query(vec, k, exact=True)
+            exact.append(set(ids))
+            exact_times.append(elapsed)
+
+        report = {
+            "samples": len(queries),
+            "k": k,
+            "m": search_settings.hnsw_m,
+            "ef_construction": search_settings.hnsw_ef_construction,
+            "exact": self.latency(exact_times),
+            "configs": [],
+        }
+        for ef in ef_values:
+            recalls, times = [], []
+            for vec, truth in zip(queries, exact):
+                ids, elapsed = self.run_query(vec, k, ef_search=ef)
+                recalls.append(len(truth & set(ids)) / max(len(truth), 1))
+                times.append(elapsed)
+            report["configs"].append({
+                "ef_search": ef,
+                "recall_at_k": round(float(np.mean(recalls)), 4),
+                **self.latency(times),
+            })
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"m={report['m']} ef_construction={report['ef_construction']} "
+            f"samples={report['samples']} k={k}"
+        )
+        self.stdout.write(
+            f"exact scan     p50 {report['exact']['p50_ms']:>8.2f} ms   p95 {report['exact']['p95_ms']:>8.2f} ms"
+        )
+        for row in report["configs"]:
+            self.stdout.write(
+                f"ef_search={row['ef_search']:<5} recall@{k} {row['recall_at_k']:.3f}   "
+                f"p50 {row['p50_ms']:>8.2f} ms   p95 {row['p95_ms']:>8.2f} ms"
+            )
+
+    def sample_queries(self, n):
+        """Title embeddings make realistic queries; fall back to random chunks."""
+        vectors = list(
+            Paper.objects.filter(title_embedding__isnull=False)
+            .order_by("?").values_list("title_embedding", flat=True)[:n]
+        )
+        if len(vectors) < n:
+            vectors += list(
+                PaperChunk.objects.order_by("?").values_list("embedding", flat=True)[:n - len(vectors)]
+            )
+        return [_vector_literal(v) for v in vectors]
+
+    def run_query(self, vec, k, ef_search=None, exact=False):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if exact:
+                # Disable index scans so the planner sorts every row
+                cursor.execute("SET LOCAL enable_indexscan = off")
+            else:
+                configure_ann_scan(ef_search=ef_search)
+            start = time.perf_counter()
+            cursor.execute(ANN_SQL, [vec, k])
+            ids = [row[0] for row in cursor.fetchall()]
+            elapsed = (time.perf_counter() - start) * 1000
+        return ids, elapsed
+
+    @staticmethod
+    def latency(times):
+        return {
+            "p50_ms": round(float(np.percentile(times, 50)), 3),
+            "p95_ms": round(float(np.percentile(times, 95)), 3),
+        }
+
+    def rebuild_index(self, m, ef_construction):
+        """
+        Build the new index CONCURRENTLY beside the old one, then drop the old
+        one CONCURRENTLY and take over its name. Chunk writes keep working
+        throughout, and searches keep using the old index until the swap.
+        (REINDEX CONCURRENTLY cannot change m / ef_construction.)
+        """
+        if connection.in_atomic_block:
+            raise CommandError("--rebuild uses CREATE/DROP INDEX CONCURRENTLY and cannot run inside a transaction")
+        self.stdout.write(f"Rebuilding {HNSW_INDEX_NAME} (m={m}, ef_construction={ef_construction})...")
+        with connection.cursor() as cursor:
+            # Left INVALID by an interrupted earlier run
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {REBUILD_INDEX_NAME}")
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY {REBUILD_INDEX_NAME} ON papers_paperchunk "
+                f"USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+            )
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {HNSW_INDEX_NAME}")
+            cursor.execute(f"ALTER INDEX {REBUILD_INDEX_NAME} RENAME TO {HNSW_INDEX_NAME}")
+        self.stdout.write(self.style.SUCCESS("✓ Index rebuilt"))
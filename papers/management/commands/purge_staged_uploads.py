@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from utils.upload_staging import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = "Deletes staged metadata-preview uploads whose upload token has expired"
+
+    def handle(self, *args, **kwargs):
+        removed = purge_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Purged {removed} expired staged upload(s)."))
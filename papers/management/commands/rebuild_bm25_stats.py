@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from utils.bm25 import rebuild_stats
+from utils.search_cache import bump_index_generation
+
+
+class Command(BaseCommand):
+    help = "Recompute BM25 corpus statistics (term document frequencies, chunk lengths) from all chunks."
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Rebuilding BM25 statistics...")
+        term_count, corpus = rebuild_stats()
+        bump_index_generation()
+
+        chunk_count = corpus.chunk_count if corpus else 0
+        avg_len = corpus.avg_chunk_length if corpus else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {term_count} terms across {chunk_count} chunks (avg length {avg_len:.1f} tokens)"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from utils.facets import rebuild_facet_counts
+from utils.search_cache import bump_index_generation
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the tag/college/program/year/author facet counts from the papers table. "
+        "Needed only after edits that bypass model signals (bulk_create, queryset.update, raw SQL)."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_facet_counts()
+        bump_index_generation()
+        self.stdout.write(self.style.SUCCESS(f"✓ Rebuilt {rows} facet counts"))
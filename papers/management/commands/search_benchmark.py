@@ -0,0 +1,234 @@
+import contextlib
+import hashlib
+import itertools
+import json
+import math
+import random
+import subprocess
+import time
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from papers.models import Paper, PaperChunk
+from papers.views.partial_views import paper_list_partial
+from staff.utils import get_search_settings
+from utils import facets, search_cache
+from utils import semantic_search as search_module
+from utils.bm25 import add_chunks_to_stats
+from utils.search_cache import bump_index_generation
+
+DIMENSIONS = 768
+
+# Each synthetic paper belongs to one topic; its chunks draw most words from
+# that topic's vocabulary, so a query built from topic words has a known set
+# of relevant papers.
+TOPICS = {
+    "crops": ["crop", "yield", "soil", "irrigation", "harvest", "fertilizer", "rice", "farm"],
+    "networks": ["network", "router", "latency", "packet", "bandwidth", "protocol", "wireless", "topology"],
+    "finance": ["accounting", "audit", "ledger", "tax", "revenue", "budget", "inventory", "payroll"],
+    "tourism": ["hotel", "tourism", "guest", "booking", "hospitality", "restaurant", "travel", "service"],
+    "learning": ["neural", "training", "classifier", "dataset", "accuracy", "model", "learning", "feature"],
+    "health": ["patient", "clinic", "diagnosis", "nutrition", "disease", "hospital", "symptom", "care"],
+}
+COMMON_WORDS = [
+    "study", "result", "method", "system", "analysis", "data", "students",
+    "respondents", "survey", "design", "evaluation", "implementation",
+]
+QUERIES = [
+    ("crop yield prediction", "crops"),
+    ("wireless network latency", "networks"),
+    ("tax audit ledger", "finance"),
+    ("hotel guest booking", "tourism"),
+    ("neural classifier accuracy", "learning"),
+    ("patient diagnosis clinic", "health"),
+    ("soil irrigation", "crops"),
+    ("packet routing protocol", "networks"),
+    ("inventory and payroll system", "finance"),
+    ("training dataset features", "learning"),
+]
+
+
+def fake_embed(text):
+    """
+    Deterministic local embedder: the normalized sum of one fixed random
+    vector per token (seeded by the token's hash). Shared words -> similar
+    vectors, with no network calls.
+    """
+    vec = np.zeros(DIMENSIONS, dtype=np.float32)
+    for token in text.lower().split():
+        seed = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:8], "little")
+        vec += np.random.default_rng(seed).standard_normal(DIMENSIONS).astype(np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def ndcg_at_k(ranked_ids, relevant_ids, k=10):
+    dcg = sum(
+        1.0 / math.log2(i + 2) for i, pid in enumerate(ranked_ids[:k]) if pid in relevant_ids
+    )
+    ideal = sum(1.0 / math.log2(i + 2) for i in range(min(len(relevant_ids), k)))
+    return dcg / ideal if ideal else 0.0
+
+
+def isolated_index_generation():
+    """
+    Patch the index generation to an in-process counter. The real one is a
+    Postgres sequence, which the rollback would not undo, so every bump
+    here would invalidate the live search and facet caches. The "bench"
+    prefix keeps these keys apart from real generations.
+    """
+    counter = itertools.count(1)
+    current = ["bench0"]
+
+    def next_generation():
+        current[0] = f"bench{next(counter)}"
+        return current[0]
+
+    def get_generation():
+        return current[0]
+
+    patches = [
+        mock.patch.object(search_cache, "_next_generation", next_generation),
+        mock.patch.object(search_cache, "get_index_generation", get_generation),
+        mock.patch.object(facets, "get_index_generation", get_generation),
+    ]
+    stack = contextlib.ExitStack()
+    for patch in patches:
+        stack.enter_context(patch)
+    return stack
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark keyword_search, semantic_search and paper_list_partial on a synthetic "
+        "corpus with a deterministic fake embedder. Runs inside a transaction that is "
+        "rolled back, and prints a JSON report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--papers", type=int, default=300, help="Synthetic papers to create")
+        parser.add_argument("--chunks-per-paper", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per query")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        with isolated_index_generation(), transaction.atomic():
+            corpus = self.build_corpus(options["papers"], options["chunks_per_paper"], options["seed"])
+            with mock.patch.object(search_module, "embed_query", fake_embed):
+                report = self.run(corpus, options["repeat"])
+            # Never keep the synthetic corpus
+            transaction.set_rollback(True)
+
+        search_settings = get_search_settings()
+        report["config"] = {
+            "papers": options["papers"],
+            "chunks_per_paper": options["chunks_per_paper"],
+            "repeat": options["repeat"],
+            "seed": options["seed"],
+            "fusion_method": search_settings.fusion_method,
+            "paper_shortlist_size": search_settings.paper_shortlist_size,
+            "hnsw_ef_search": search_settings.hnsw_ef_search,
+            "vector_backend": search_settings.vector_backend,
+        }
+        report["commit"] = _git_commit()
+        report["timestamp"] = int(time.time())
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"✓ Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def build_corpus(self, n_papers, chunks_per_paper, seed):
+        rng = random.Random(seed)
+        topic_names = sorted(TOPICS)
+        papers, topics = [], []
+        for i in range(n_papers):
+            topic = topic_names[i % len(topic_names)]
+            words = TOPICS[topic]
+            topics.append(topic)
+            papers.append(Paper(
+                title=f"Benchmark {topic} {' '.join(rng.sample(words, 3))} {i}",
+                authors=[f"Author {rng.randint(1, 50)}"],
+                abstract=" ".join(rng.choices(words + COMMON_WORDS, k=60)),
+                year=2015 + i % 10,
+                status="complete",
+                is_indexed=True,
+            ))
+        papers = Paper.objects.bulk_create(papers)
+
+        chunks = []
+        for paper, topic in zip(papers, topics):
+            vocabulary = TOPICS[topic] * 3 + COMMON_WORDS
+            for j in range(chunks_per_paper):
+                text = " ".join(rng.choices(vocabulary, k=120))
+                chunks.append(PaperChunk(
+                    paper=paper, title=paper.title, authors=paper.authors,
+                    page=j // 4 + 1, chunk_id=j, text=text, embedding=fake_embed(text),
+                ))
+        created = PaperChunk.objects.bulk_create(chunks, batch_size=1000)
+        add_chunks_to_stats(PaperChunk.objects.filter(id__in=[c.id for c in created]))
+        search_module.update_paper_centroids([p.id for p in papers])
+        bump_index_generation()
+
+        relevant = {}
+        for paper, topic in zip(papers, topics):
+            relevant.setdefault(topic, set()).add(paper.id)
+        return {"relevant": relevant, "papers": len(papers), "chunks": len(created)}
+
+    def run(self, corpus, repeat):
+        factory = RequestFactory()
+
+        def list_view(query):
+            request = factory.get("/papers/partials/paper-list/", {"q": query})
+            request.user = AnonymousUser()
+            paper_list_partial(request)
+            return None
+
+        operations = {
+            "keyword_search": lambda q: [r["paper_id"] for r in search_module.keyword_search(q)],
+            "semantic_search": lambda q: [r["paper_id"] for r in search_module.semantic_search(q)],
+            "paper_list_partial": list_view,
+        }
+
+        results = {}
+        for name, op in operations.items():
+            latencies, query_counts, ndcgs = [], [], []
+            for query, topic in QUERIES:
+                for _ in range(repeat):
+                    # Cold result cache every run
+                    bump_index_generation()
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        ranked = op(query)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    query_counts.append(len(captured.captured_queries))
+                if ranked is not None:
+                    ndcgs.append(ndcg_at_k(ranked, corpus["relevant"][topic]))
+
+            results[name] = {
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                "mean_ms": round(float(np.mean(latencies)), 3),
+                "db_queries_mean": round(float(np.mean(query_counts)), 2),
+                "ndcg_at_10": round(float(np.mean(ndcgs)), 4) if ndcgs else None,
+            }
+        return {"corpus": {"papers": corpus["papers"], "chunks": corpus["chunks"]}, "results": results}
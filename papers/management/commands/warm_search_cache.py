@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from utils import cache_warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay curated and popular library searches to fill the query-embedding and "
+        "search result caches. With the default locmem cache this only warms this "
+        "process; web workers warm themselves at boot and after reindexing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=None,
+            help="Logged queries to replay (default: SearchSettings.warmup_query_count)",
+        )
+        parser.add_argument("--list", action="store_true", help="Only print the queries")
+
+    def handle(self, *args, **options):
+        queries = cache_warmup.warmup_queries(limit=options["limit"])
+        if options["list"]:
+            for query in queries:
+                self.stdout.write(query)
+            return
+        if not queries:
+            self.stdout.write(self.style.WARNING("No curated or logged queries to warm."))
+            return
+        result = cache_warmup.warm_search_caches(queries)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Warmed {result['queries'] - result['failed']}/{result['queries']} queries in {result['ms']} ms"
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0029_alter_paper_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paperchunk',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('text', config='english'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='paperchunk',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='paperchunk_search_vector_gin'),
+        ),
+        # The expression index from 0026 is superseded by the stored column
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS paperchunk_text_gin_idx;",
+            reverse_sql="""
+            CREATE INDEX IF NOT EXISTS paperchunk_text_gin_idx 
+            ON papers_paperchunk 
+            USING GIN (to_tsvector('english', text));
+            """,
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0030_paperchunk_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paperchunk',
+            name='token_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SearchCorpusStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_count', models.IntegerField(default=0)),
+                ('total_tokens', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Search Corpus Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTermStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.TextField(unique=True)),
+                ('doc_freq', models.IntegerField(default=0)),
+            ],
+        ),
+        # Backfill chunk lengths and corpus statistics for already indexed chunks
+        migrations.RunSQL(
+            """
+            UPDATE papers_paperchunk c SET token_count = COALESCE((
+                SELECT SUM(COALESCE(array_length(u.positions, 1), 1))
+                FROM unnest(c.search_vector) u
+            ), 0);
+
+            INSERT INTO papers_searchtermstat (term, doc_freq)
+            SELECT u.lexeme, COUNT(*)
+            FROM papers_paperchunk c CROSS JOIN LATERAL unnest(c.search_vector) u
+            GROUP BY u.lexeme;
+
+            INSERT INTO papers_searchcorpusstat (id, chunk_count, total_tokens)
+            SELECT 1, COUNT(*), COALESCE(SUM(token_count), 0) FROM papers_paperchunk;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
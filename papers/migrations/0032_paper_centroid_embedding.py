@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:40
+
+import pgvector.django.indexes
+import pgvector.django.vector
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0031_bm25_corpus_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paper',
+            name='centroid_embedding',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=768, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='paper',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['centroid_embedding'], m=16, name='paper_centroid_hnsw_idx', opclasses=['vector_cosine_ops']),
+        ),
+        # Backfill centroids for papers that are already indexed
+        migrations.RunSQL(
+            """
+            UPDATE papers_paper p
+            SET centroid_embedding = c.centroid
+            FROM (
+                SELECT paper_id, AVG(embedding) AS centroid
+                FROM papers_paperchunk
+                WHERE paper_id IS NOT NULL
+                GROUP BY paper_id
+            ) c
+            WHERE c.paper_id = p.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
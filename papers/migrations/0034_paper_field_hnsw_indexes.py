@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:05
+
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0033_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paper',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['title_embedding'], m=16, name='paper_title_hnsw_idx', opclasses=['vector_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='paper',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['abstract_embedding'], m=16, name='paper_abstract_hnsw_idx', opclasses=['vector_cosine_ops']),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:20
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def backfill_facet_counts(apps, schema_editor):
+    from utils.facets import paper_facets
+
+    Paper = apps.get_model('papers', 'Paper')
+    FacetCount = apps.get_model('papers', 'FacetCount')
+    counts = Counter()
+    rows = Paper.objects.values_list('tags', 'college', 'program', 'year', 'authors')
+    for tags, college, program, year, authors in rows.iterator():
+        counts.update(paper_facets(tags, college, program, year, authors))
+    FacetCount.objects.bulk_create(
+        [FacetCount(facet=facet, value=value, count=count) for (facet, value), count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0035_searchquerystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=32)),
+                ('value', models.TextField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='facetcount_facet_value_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
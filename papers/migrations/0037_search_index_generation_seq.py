@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0036_facetcount'),
+    ]
+
+    operations = [
+        # Search cache generation shared by all workers (utils/search_cache.py)
+        migrations.RunSQL(
+            "CREATE SEQUENCE IF NOT EXISTS papers_search_index_generation_seq",
+            "DROP SEQUENCE IF EXISTS papers_search_index_generation_seq",
+        ),
+    ]
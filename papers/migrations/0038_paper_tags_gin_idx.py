@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:40
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('papers', '0037_search_index_generation_seq'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paper',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='paper_tags_gin_idx'),
+        ),
+    ]
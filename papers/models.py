@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
-from pgvector.django import VectorField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from pgvector.django import HnswIndex, VectorField
 from django.core.cache import cache
 from django.core.validators import RegexValidator
 
@@ -39,6 +42,8 @@ class Paper(models.Model):
     authors = models.JSONField(default=list) 
     abstract = models.TextField(blank=True, null=True)
     abstract_embedding = VectorField(dimensions=768, null=True)
+    # Mean of the paper's chunk embeddings; first stage of two-level retrieval
+    centroid_embedding = VectorField(dimensions=768, null=True, blank=True)
     college = models.CharField(max_length=100, blank=True, null=True, choices=COLLEGE_CHOICES,  db_index=True)
     program = models.CharField(max_length=100, blank=True, null=True, choices=PROGRAM_CHOICES, db_index=True)
     summary = models.TextField(blank=True, null=True)
@@ -64,6 +69,36 @@ class Paper(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["college", "program", "year"]),
+            HnswIndex(
+                name="paper_centroid_hnsw_idx",
+                fields=["centroid_embedding"],
+                m=16,
+                ef_construction=64,
+                opclasses=["vector_cosine_ops"],
+            ),
+            # Title/abstract legs of multi-field semantic search
+            HnswIndex(
+                name="paper_title_hnsw_idx",
+                fields=["title_embedding"],
+                m=16,
+                ef_construction=64,
+                opclasses=["vector_cosine_ops"],
+            ),
+            HnswIndex(
+                name="paper_abstract_hnsw_idx",
+                fields=["abstract_embedding"],
+                m=16,
+                ef_construction=64,
+                opclasses=["vector_cosine_ops"],
+            ),
+            # Trigram indexes for the fuzzy search tier (utils/fuzzy.py)
+            GinIndex(OpClass("title", name="gin_trgm_ops"), name="paper_title_trgm_idx"),
+            GinIndex(
+                OpClass(Cast("authors", models.TextField()), name="gin_trgm_ops"),
+                name="paper_authors_trgm_idx",
+            ),
+            # jsonb `?|` (tags__has_any_keys) for fuzzy tag matches
+            GinIndex(fields=["tags"], name="paper_tags_gin_idx"),
         ]
 
     """
@@ -92,13 +127,76 @@ class PaperChunk(models.Model):
     chunk_id = models.IntegerField()
     text = models.TextField()
     embedding = VectorField(dimensions=768)  # MiniLM-L6-v2 = 384 dims // embeddinggemma = 768
+    # Stored tsvector kept in sync by Postgres; used by keyword and hybrid search
+    search_vector = models.GeneratedField(
+        expression=SearchVector("text", config="english"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    # Number of tokens in search_vector (BM25 document length)
+    token_count = models.IntegerField(default=0)
 
     class Meta:
         indexes = [
             models.Index(fields=["paper_id"]),
+            GinIndex(fields=["search_vector"], name="paperchunk_search_vector_gin"),
         ]
 
 
+class SearchTermStat(models.Model):
+    """Document frequency of one tsvector lexeme across all chunks (BM25 IDF)."""
+    term = models.TextField(unique=True)
+    doc_freq = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term} ({self.doc_freq})"
+
+
+class SearchCorpusStat(models.Model):
+    """Singleton row with corpus totals used for BM25 length normalization."""
+    chunk_count = models.IntegerField(default=0)
+    total_tokens = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Search Corpus Stats"
+
+    @property
+    def avg_chunk_length(self):
+        return (self.total_tokens / self.chunk_count) if self.chunk_count else 0.0
+
+
+class SearchQueryStat(models.Model):
+    """How often a normalized library search query was run (cache warm-up source)."""
+    query = models.TextField(unique=True)
+    count = models.PositiveIntegerField(default=0)
+    last_searched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-count"], name="searchquerystat_count_idx")]
+
+    def __str__(self):
+        return f"{self.query} ({self.count})"
+
+
+class FacetCount(models.Model):
+    """
+    Number of papers per facet value (tags, colleges, programs, years, authors
+    and the year/tag and college/program pairs used by insights). Kept current
+    by the Paper signals; see utils/facets.py.
+    """
+    facet = models.CharField(max_length=32)
+    value = models.TextField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["facet", "value"], name="facetcount_facet_value_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value} ({self.count})"
+
+
 class SavedPaper(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_papers')
     paper = models.ForeignKey(Paper, on_delete=models.CASCADE)
@@ -140,6 +238,9 @@ class Tag(models.Model):
         ordering = ['name']
         verbose_name = 'Tag'
         verbose_name_plural = 'Tags'
+        indexes = [
+            GinIndex(OpClass("name", name="gin_trgm_ops"), name="tag_name_trgm_idx"),
+        ]
     
     def __str__(self):
         return self.name
@@ -1,6 +1,15 @@
-from django.db.models.signals import post_save, post_delete
+from collections import Counter
+
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import MatchedCitation, Paper
+from .models import MatchedCitation, Paper, PaperChunk
+from utils.search_cache import bump_index_generation
+from utils.bm25 import remove_chunks_from_stats
+from utils import vector_store
+from utils import autocomplete_index
+from utils import cache_warmup
+from utils import chunk_matrix_cache
+from utils import facets
 
 @receiver([post_save, post_delete], sender=MatchedCitation)
 def update_citation_cache(sender, instance, **kwargs):
@@ -14,3 +23,81 @@ def update_citation_cache(sender, instance, **kwargs):
     if matched:
         matched.citation_count_cached = matched.reverse_matched_citations.count()
         matched.save(update_fields=["citation_count_cached"])
+
+
+@receiver(pre_save, sender=Paper)
+def snapshot_paper_facets(sender, instance, update_fields=None, **kwargs):
+    # Remember the stored facet values so post_save can apply the difference
+    instance._facet_snapshot = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(facets.FACET_FIELDS):
+        return
+    row = Paper.objects.filter(pk=instance.pk).values_list(*facets.FACET_FIELDS).first()
+    instance._facet_snapshot = facets.paper_facets(*row) if row else Counter()
+
+
+# Registered before invalidate_search_cache so the facet cache generation is
+# bumped only after the counts have changed
+@receiver(post_save, sender=Paper)
+def update_facet_counts(sender, instance, created, update_fields=None, **kwargs):
+    old = getattr(instance, "_facet_snapshot", None)
+    if old is None and not created:
+        # Save that did not touch facet fields
+        return
+    facets.apply_delta(facets.diff(old or Counter(), facets.facets_of(instance)))
+    instance._facet_snapshot = None
+
+
+@receiver(post_delete, sender=Paper)
+def remove_facet_counts(sender, instance, **kwargs):
+    facets.apply_delta(facets.diff(facets.facets_of(instance), Counter()))
+
+
+# Paper fields that search hits, filters and facets depend on; saves limited
+# to other fields (status, summary, cached counters, ...) keep the caches
+SEARCH_FIELDS = {
+    "title", "title_embedding", "abstract", "abstract_embedding", "authors",
+    "tags", "college", "program", "year", "is_indexed",
+}
+
+
+@receiver([post_save, post_delete], sender=Paper)
+def invalidate_search_cache(sender, instance, update_fields=None, **kwargs):
+    # Cached search results embed paper ids and filter matches
+    if update_fields is not None and not set(update_fields) & SEARCH_FIELDS:
+        return
+    bump_index_generation()
+    cache_warmup.schedule_after_reindex()
+
+
+@receiver(pre_delete, sender=Paper)
+def remove_paper_from_bm25_stats(sender, instance, **kwargs):
+    # Chunks go away with the paper (CASCADE); take them out of the corpus stats first
+    remove_chunks_from_stats(PaperChunk.objects.filter(paper=instance))
+
+
+@receiver(pre_delete, sender=Paper)
+def remove_paper_from_vector_store(sender, instance, **kwargs):
+    vector_store.remove_paper(instance.id)
+
+
+@receiver(post_delete, sender=Paper)
+def remove_from_chunk_matrix_cache(sender, instance, **kwargs):
+    chunk_matrix_cache.invalidate_paper(instance.id)
+
+
+# The autocomplete index only holds titles and author names
+AUTOCOMPLETE_FIELDS = {"title", "authors"}
+
+
+@receiver(post_save, sender=Paper)
+def update_autocomplete_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & AUTOCOMPLETE_FIELDS:
+        return
+    autocomplete_index.index_paper(instance)
+
+
+@receiver(post_delete, sender=Paper)
+def remove_from_autocomplete_index(sender, instance, **kwargs):
+    autocomplete_index.unindex_paper(instance.id)
@@ -1,3 +1,281 @@
-from django.test import TestCase
+import json
+import math
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from papers.models import Paper, PaperChunk
+from utils.chunk_matrix_cache import PaperChunkMatrix
+from utils.query_parser import merge_filters, parse_query, year_range
+from utils.search_cache import INDEX_GENERATION_SEQUENCE, bump_index_generation, make_search_cache_key
+from utils.semantic_search import filter_papers
+from utils.single_paper_rag import _merge_ranges
+from utils.snippets import make_snippet
+
+
+class ParseQueryTests(SimpleTestCase):
+    def test_operators_become_filters(self):
+        parsed = parse_query('author:Santos tag:"machine learning" college:CCS barcode')
+        self.assertEqual(parsed["text"], "barcode")
+        self.assertEqual(parsed["filters"], {
+            "author": ["Santos"],
+            "tags": ["machine learning"],
+            "college": "ccs",
+        })
+
+    def test_operators_are_case_insensitive_and_repeatable(self):
+        parsed = parse_query("AUTHOR:Santos author:Reyes")
+        self.assertEqual(parsed["text"], "")
+        self.assertEqual(parsed["filters"], {"author": ["Santos", "Reyes"]})
+
+    def test_quoted_phrases_stay_in_text(self):
+        parsed = parse_query('"inventory system" barcode')
+        self.assertEqual(parsed["text"], '"inventory system" barcode')
+        self.assertEqual(parsed["filters"], {"phrases": ["inventory system"]})
+
+    def test_empty_values_are_ignored(self):
+        parsed = parse_query('author:"" thesis')
+        self.assertEqual(parsed["filters"], {})
+        self.assertEqual(parsed["text"], "thesis")
+
+    def test_year_and_year_range(self):
+        self.assertEqual(parse_query("year:2023")["filters"], {"year": "2023"})
+        self.assertEqual(parse_query("year:2019-2023 ai")["filters"], {"year": "2019-2023"})
+        self.assertEqual(parse_query("year:2019..2023")["filters"], {"year": "2019..2023"})
+
+    def test_invalid_year_is_kept_as_text(self):
+        parsed = parse_query("year:recent thesis")
+        self.assertEqual(parsed["filters"], {})
+        self.assertEqual(parsed["text"], "recent thesis")
+
+    def test_year_range(self):
+        self.assertEqual(year_range("2023"), (2023, 2023))
+        self.assertEqual(year_range("2019-2023"), (2019, 2023))
+        self.assertEqual(year_range("2023..2019"), (2019, 2023))
+        self.assertIsNone(year_range("20x3"))
+        self.assertIsNone(year_range(None))
+
+    def test_merge_filters(self):
+        merged = merge_filters(
+            {"author": ["Santos"], "year": "2020", "college": ""},
+            {"author": ["Santos", "Reyes"], "year": "2023"},
+        )
+        self.assertEqual(merged, {"author": ["Santos", "Reyes"], "year": "2023"})
+
+
+class MakeSnippetTests(SimpleTestCase):
+    def test_text_is_escaped_and_terms_marked(self):
+        self.assertEqual(
+            make_snippet("<b>Deep</b> learning & more", "learning"),
+            "&lt;b&gt;Deep&lt;/b&gt; <mark>learning</mark> &amp; more",
+        )
+
+    def test_markup_in_query_is_not_injected(self):
+        self.assertEqual(
+            make_snippet("a <script> tag", "<script>"),
+            "a &lt;<mark>script</mark>&gt; tag",
+        )
+
+    def test_prefix_match(self):
+        self.assertIn("<mark>learning</mark>", make_snippet("Machine learning models", "learn"))
+
+    def test_no_match_returns_start_of_text(self):
+        snippet = make_snippet("word " * 100, "zzz", max_chars=50)
+        self.assertTrue(snippet.startswith("word"))
+        self.assertTrue(snippet.endswith("…"))
+        self.assertNotIn("<mark>", snippet)
+
+    def test_window_moves_to_matches(self):
+        text = "filler " * 100 + "barcode inventory system"
+        snippet = make_snippet(text, "barcode inventory", max_chars=80)
+        self.assertTrue(snippet.startswith("…"))
+        self.assertIn("<mark>barcode</mark> <mark>inventory</mark>", snippet)
+
+    def test_empty_text(self):
+        self.assertEqual(make_snippet("", "query"), "")
+        self.assertEqual(make_snippet(None, "query"), "")
+
+
+class MergeRangesTests(SimpleTestCase):
+    def test_overlapping_and_adjacent_ranges_merge(self):
+        self.assertEqual(
+            _merge_ranges([(5, 7), (1, 2), (3, 4), (10, 12), (11, 11)]),
+            [(1, 7), (10, 12)],
+        )
+
+    def test_disjoint_ranges_are_kept(self):
+        self.assertEqual(_merge_ranges([(4, 5), (1, 2)]), [(1, 2), (4, 5)])
+
+    def test_empty(self):
+        self.assertEqual(_merge_ranges([]), [])
+
+
+class PaperChunkMatrixTests(SimpleTestCase):
+    def setUp(self):
+        # (id, page, chunk_id, text, embedding)
+        self.matrix = PaperChunkMatrix(7, [
+            (10, 1, 0, "alpha", [1.0, 0.0, 0.0]),
+            (11, 1, 1, "beta", [0.0, 1.0, 0.0]),
+            (12, 2, 2, "gamma", [1.0, 1.0, 0.0]),
+            (13, 4, 3, "delta", [0.0, 0.0, 2.0]),
+        ])
+
+    def test_search_returns_nearest_first(self):
+        hits = self.matrix.search([2.0, 0.0, 0.0], 2)
+        self.assertEqual([chunk.id for chunk, _ in hits], [10, 12])
+        self.assertAlmostEqual(hits[0][1], 0.0, places=5)
+        self.assertAlmostEqual(hits[1][1], 1 - 1 / math.sqrt(2), places=5)
+
+    def test_search_rebuilds_chunks(self):
+        chunk, _ = self.matrix.search([0.0, 0.0, 1.0], 1)[0]
+        self.assertEqual((chunk.id, chunk.paper_id, chunk.page, chunk.chunk_id, chunk.text), (13, 7, 4, 3, "delta"))
+
+    def test_search_k_is_clamped(self):
+        self.assertEqual(len(self.matrix.search([1.0, 0.0, 0.0], 10)), 4)
+        self.assertEqual(self.matrix.search([1.0, 0.0, 0.0], 0), [])
+        self.assertEqual(PaperChunkMatrix(7, []).search([1.0, 0.0, 0.0], 3), [])
+
+    def test_expand_by_page(self):
+        expanded = self.matrix.expand([self.matrix.chunk(0)], window=1)
+        self.assertEqual([chunk.id for chunk in expanded], [10, 11, 12])
+
+    def test_expand_by_ordinal_without_pages(self):
+        matrix = PaperChunkMatrix(7, [
+            (20 + i, None, i, f"chunk {i}", [1.0, float(i), 0.0]) for i in range(6)
+        ])
+        expanded = matrix.expand([matrix.chunk(3)], window=1)
+        self.assertEqual([chunk.chunk_id for chunk in expanded], [2, 3, 4])
+
+    def test_expand_without_hits(self):
+        self.assertEqual(self.matrix.expand([]), [])
+
+
+class FilterPapersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.crops = Paper.objects.create(
+            title="Crop yield prediction", authors=["Maria Santos", "Jose Reyes"],
+            college="CEA", program="BSABE", year=2019,
+            tags=["agriculture", "machine learning"], file="papers/crops.pdf",
+        )
+        cls.network = Paper.objects.create(
+            title="Campus wireless network", authors=["Ana Cruz"],
+            college="CCS", program="BSIT", year=2023, tags=["networks"], file="papers/network.pdf",
+        )
+        cls.ledger = Paper.objects.create(
+            title="Barangay ledger system", authors=["Pedro Santos"],
+            college="CCS", program="BSCS", year=2021, tags=[], file="papers/ledger.pdf",
+        )
+        PaperChunk.objects.create(
+            paper=cls.crops, title=cls.crops.title, authors=cls.crops.authors, page=1, chunk_id=0,
+            text="An inventory system for rice farms.", embedding=[0.0] * 768,
+        )
+
+    def ids(self, filters):
+        return set(filter_papers(filters).values_list("id", flat=True))
+
+    def test_no_filters(self):
+        self.assertIsNone(filter_papers({}))
+        self.assertIsNone(filter_papers(None))
+        self.assertIsNone(filter_papers({"author": [], "college": ""}))
+
+    def test_invalid_year_is_not_applied(self):
+        self.assertIsNone(filter_papers({"year": "soon"}))
+
+    def test_authors_match_case_insensitively_and_all_must_match(self):
+        self.assertEqual(self.ids({"author": ["santos"]}), {self.crops.id, self.ledger.id})
+        self.assertEqual(self.ids({"author": ["santos", "REYES"]}), {self.crops.id})
+        self.assertEqual(self.ids({"author": "cruz"}), {self.network.id})
+
+    def test_year_and_year_range(self):
+        self.assertEqual(self.ids({"year": "2023"}), {self.network.id})
+        self.assertEqual(self.ids({"year": "2019-2021"}), {self.crops.id, self.ledger.id})
+        self.assertEqual(self.ids({"year": "2021..2019"}), {self.crops.id, self.ledger.id})
+
+    def test_any_tag_matches(self):
+        self.assertEqual(self.ids({"tags": ["networks", "agriculture"]}), {self.crops.id, self.network.id})
+        self.assertEqual(self.ids({"tags": ["machine learning"]}), {self.crops.id})
+
+    def test_phrases_must_appear_in_a_chunk(self):
+        self.assertEqual(self.ids({"phrases": ["inventory system"]}), {self.crops.id})
+        self.assertEqual(self.ids({"phrases": ["system inventory"]}), set())
+
+    def test_college_and_program(self):
+        self.assertEqual(self.ids({"college": "CCS"}), {self.network.id, self.ledger.id})
+        self.assertEqual(self.ids({"college": "CCS", "program": "BSCS"}), {self.ledger.id})
+
+    def test_parsed_operators(self):
+        filters = parse_query("author:santos year:2020-2022 ledger")["filters"]
+        self.assertEqual(self.ids(filters), {self.ledger.id})
+        filters = parse_query('author:santos "inventory system"')["filters"]
+        self.assertEqual(self.ids(filters), {self.crops.id})
+
+
+class SearchCacheKeyTests(TestCase):
+    def test_equivalent_queries_share_a_key(self):
+        self.assertEqual(
+            make_search_cache_key("  Crop   Yield ", {"tags": ["b", "a"], "year": "", "author": []}),
+            make_search_cache_key("crop yield", {"tags": ["a", "b"]}),
+        )
+
+    def test_filters_and_stage_change_the_key(self):
+        key = make_search_cache_key("crop yield")
+        self.assertNotEqual(make_search_cache_key("crop yield", {"year": "2023"}), key)
+        self.assertEqual(make_search_cache_key("crop yield", stage="fast"), f"{key}:fast")
+
+    def test_bump_changes_the_key(self):
+        key = make_search_cache_key("crop yield")
+        bump_index_generation()
+        self.assertNotEqual(make_search_cache_key("crop yield"), key)
+
+
+def _generation_sequence_state():
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT last_value, is_called FROM {INDEX_GENERATION_SEQUENCE}")
+        return cursor.fetchone()
+
+
+class SearchBenchmarkCommandTests(TestCase):
+    def test_smoke(self):
+        generation = _generation_sequence_state()
+        out = StringIO()
+        call_command("search_benchmark", papers=12, chunks_per_paper=2, repeat=1, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["corpus"], {"papers": 12, "chunks": 24})
+        self.assertEqual(set(report["results"]), {"keyword_search", "semantic_search", "paper_list_partial"})
+        for result in report["results"].values():
+            self.assertGreaterEqual(result["p95_ms"], result["p50_ms"])
+        # The synthetic corpus is rolled back and the live generation is untouched
+        self.assertFalse(Paper.objects.exists())
+        self.assertEqual(_generation_sequence_state(), generation)
+
+
+class HnswReportCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        paper = Paper.objects.create(title="HNSW report", authors=["Ana Cruz"], file="papers/hnsw.pdf")
+        PaperChunk.objects.bulk_create([
+            PaperChunk(
+                paper=paper, title=paper.title, authors=paper.authors, page=1, chunk_id=i,
+                text=f"chunk {i}", embedding=[float(i == j) + 0.1 for j in range(768)],
+            )
+            for i in range(6)
+        ])
+
+    def test_smoke(self):
+        out = StringIO()
+        call_command("hnsw_report", samples=3, k=2, ef_search=[10, 40], json=True, stdout=out)
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["samples"], 3)
+        self.assertEqual([row["ef_search"] for row in report["configs"]], [10, 40])
+        for row in report["configs"]:
+            self.assertGreaterEqual(row["recall_at_k"], 0.0)
+            self.assertLessEqual(row["recall_at_k"], 1.0)
+
+    def test_rebuild_refuses_to_run_in_a_transaction(self):
+        with self.assertRaises(CommandError):
+            call_command("hnsw_report", rebuild=True, stdout=StringIO())
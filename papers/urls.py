@@ -36,6 +36,8 @@ urlpatterns = [
     # Partials
     path('partials/uploaded-papers/', uploaded_papers_partial, name='uploaded_papers_partial'),
     path('partials/paper-list/', paper_list_partial, name='paper_list_partial'),
+    path('partials/paper-list/more/', paper_list_more, name='paper_list_more'),
+    path('partials/paper-list/stream/', paper_list_stream, name='paper_list_stream'),
     path('partials/saved-papers/', saved_papers_partial, name='saved_papers_partial'),
     path('partials/review/', review_papers_partial, name='review_papers_partials'),
     path('paper/<int:pk>/partials/', paper_detail_partials, name='paper_detail_partials'),
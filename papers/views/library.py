@@ -2,6 +2,7 @@ from django.shortcuts import render
 from django.db.models import Q
 from papers.models import Paper, COLLEGE_CHOICES, PROGRAM_CHOICES
 from django.contrib.auth.decorators import login_required
+from utils.facets import get_facet_counts
 
 @login_required
 def paper_library(request):
@@ -22,10 +23,7 @@ def paper_library(request):
         papers = papers.filter(tags__contains=[selected_tag])
 
     # Get all unique tags
-    all_tags = set()
-    for paper in Paper.objects.all():
-        all_tags.update(paper.tags)
-    all_tags = sorted(list(all_tags))
+    all_tags = sorted(get_facet_counts()["tag"])
 
     # Organize papers by college
     college_papers = {}
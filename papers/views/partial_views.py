@@ -1,11 +1,18 @@
 from django.shortcuts import render, get_object_or_404
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
 from papers.models import Paper, MatchedCitation, SavedPaper
-from django.db.models import Prefetch, Q, F, Count
+from django.db.models import BooleanField, Count, Exists, F, OuterRef, Prefetch, Q, Value
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from utils.semantic_search import semantic_search, keyword_search, index_paper, get_model
-from collections import Counter
-from .views import extract_matching_snippet
+from utils.semantic_search import semantic_search, keyword_search, index_paper, get_model, filter_papers
+from utils.search_cache import get_cached_results, set_cached_results, normalize_query
+from utils.query_parser import parse_query, merge_filters
+from utils.fuzzy import fuzzy_search, did_you_mean
+from utils.cache_warmup import record_query
+from utils.facets import get_facet_counts
+from .views import _sse_event, extract_matching_snippet
 from django.conf import settings
 import os
 from django.core.cache import cache
@@ -19,26 +26,189 @@ def uploaded_papers_partial(request):
     papers = Paper.objects.filter(uploaded_by=request.user, status='complete').order_by('-uploaded_at')
     return render(request, 'papers/partials/uploads/uploaded_papers.html', {'papers': papers})
 
+PAPER_LIST_PAGE_SIZE = 20
+PAPER_LIST_FIELDS = (
+    'id', 'title', 'authors', 'abstract', 'college',
+    'program', 'year', 'tags', 'file'
+)
+
+
+def _search_request(request):
+    """
+    Split the list request into free search text and structured filters.
+    Operators typed in the query (author:, year:, tag:, college:, program:,
+    "phrases") are merged with the filter parameters.
+    """
+    author = request.GET.get('author')
+    parsed = parse_query(request.GET.get('q'))
+    text = parsed["text"]
+    # Author chips submit the name as both q and author
+    if author and normalize_query(text) == normalize_query(author):
+        text = ""
+    filters = merge_filters(
+        {
+            "author": [author] if author else None,
+            "college": request.GET.get('college'),
+            "program": request.GET.get('program'),
+            "year": request.GET.get('year'),
+            "tags": request.GET.getlist('tag'),
+        },
+        parsed["filters"],
+    )
+    return text, filters
+
+
+def _filtered_papers(filters, user):
+    """
+    Paper queryset for the library list with heavy fields deferred and the
+    user's saved state annotated.
+    """
+    papers = filter_papers(filters)
+    if papers is None:
+        papers = Paper.objects.all()
+    return _with_saved_state(papers.only(*PAPER_LIST_FIELDS), user)
+
+
+def _as_hits(search_results):
+    return [
+        {
+            "paper_id": r.get("paper_id"),
+            "snippet": r.get("text", ""),
+            "score": f"{r.get('score', 0):.3f}" if r.get('score') is not None else "-",
+            "page": r.get("page"),
+            "match_type": r.get("match_type", "semantic"),
+            # Fuzzy hits carry their query's correction
+            "did_you_mean": r.get("did_you_mean"),
+        }
+        for r in search_results
+    ]
+
+
+def _fast_hits(text, search_filters):
+    """Keyword hits, or trigram matches when BM25 finds nothing. No embedding call."""
+    search_results = keyword_search(text, filters=search_filters)
+    if not search_results:
+        # Typos in titles/authors/tags: one trigram query, no embedding call
+        print('No keyword search results, trying fuzzy title/author/tag match')
+        search_results = fuzzy_search(text, filters=search_filters)
+    return _as_hits(search_results)
+
+
+def _merged_hits(text, search_filters, hits=None):
+    """
+    The final ranked list for a search: keyword (or fuzzy) hits followed by
+    the semantic hits they missed. Returns (hits, extra), where `extra` is
+    the semantic tail. This is the only writer of the final cache key, so
+    every endpoint sees the same ranking for a query. Pass `hits` when the
+    fast hits are already known.
+    """
+    if hits is None:
+        hits = get_cached_results(text, search_filters, stage="fast")
+    if hits is None:
+        hits = _fast_hits(text, search_filters)
+    extra = []
+    try:
+        seen = {h["paper_id"] for h in hits}
+        extra = [
+            h for h in _as_hits(semantic_search(text, filters=search_filters))
+            if h["paper_id"] not in seen
+        ]
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        # Don't cache a list that is missing its semantic tail
+        return hits, extra
+    hits = hits + extra
+    set_cached_results(text, search_filters, hits)
+    return hits, extra
+
+
+def _search_hits(text, search_filters):
+    """
+    Ranked search hits for the library list as plain dicts
+    ({paper_id, snippet, score, page}), served from the result cache when possible.
+    Filters are applied inside the search queries, so a filtered search
+    still returns a full top_k.
+    """
+    hits = get_cached_results(text, search_filters)
+    if hits is not None:
+        print('Search cache hit for query:', text)
+        return hits
+
+    print('Performing search for query:', text)
+    return _merged_hits(text, search_filters)[0]
+
+
+def _with_saved_state(papers, user):
+    """Annotate `is_saved` for `user` as an EXISTS subquery on the page query."""
+    if not user.is_authenticated:
+        return papers.annotate(is_saved=Value(False, output_field=BooleanField()))
+    return papers.annotate(
+        is_saved=Exists(SavedPaper.objects.filter(user=user, paper=OuterRef('pk')))
+    )
+
+
+def _hit_items(hits, query, user):
+    """Turn one page of search hits into list items (one Paper query)."""
+    papers = _with_saved_state(Paper.objects.only(*PAPER_LIST_FIELDS), user)
+    papers_map = papers.in_bulk([h["paper_id"] for h in hits])
+    items = []
+    for h in hits:
+        paper = papers_map.get(h["paper_id"])
+        if not paper:
+            continue
+        items.append({
+            "query": query,
+            "paper": paper,
+            "snippet": h["snippet"],
+            "tags": paper.tags,
+            "score": h["score"],
+            "page": h["page"],
+        })
+    return items
+
+
+def _paper_items(papers, query, snippets=False):
+    return [
+        {
+            "query": query,
+            "paper": paper,
+            "snippet": extract_matching_snippet(paper.abstract or '', query or '') if snippets else "",
+            "tags": paper.tags,
+            "score": "-",
+            "page": None,
+        }
+        for paper in papers
+    ]
+
+
+def _browse_page(papers, query, cursor=0, snippets=False):
+    """
+    One keyset page of `papers`, newest first: (items, next_cursor).
+    `cursor` is the last paper id already shown, so no OFFSET or COUNT(*).
+    """
+    papers = papers.order_by('-id')
+    if cursor:
+        papers = papers.filter(id__lt=cursor)
+    # Fetch one extra row to know whether another page exists
+    rows = list(papers[:PAPER_LIST_PAGE_SIZE + 1])
+    items = _paper_items(rows[:PAPER_LIST_PAGE_SIZE], query, snippets=snippets)
+    next_cursor = rows[PAPER_LIST_PAGE_SIZE - 1].id if len(rows) > PAPER_LIST_PAGE_SIZE else None
+    return items, next_cursor
+
+
 def paper_list_partial(request):
     partial = request.GET.get("partial")
     query = request.GET.get('q')
-    author_filter = request.GET.get('author')
     tags = request.GET.getlist('tag')
     college = request.GET.get('college')
     program = request.GET.get('program')
     year = request.GET.get('year')
     view_mode = request.GET.get('view_mode', 'card')
-    is_infinite = request.GET.get('infinite') == 'true'  # New flag for infinite scroll
 
-    results = []
-
-    # --- Tag counts ---
-    tag_data = Paper.objects.only('tags').values_list('tags', flat=True)
-    all_tags = []
-    for tlist in tag_data:
-        if isinstance(tlist, list):
-            all_tags.extend(tlist)
-    tag_counts = dict(Counter(all_tags))
+    # --- Tag counts (one read of the facet counts) ---
+    facet_counts = get_facet_counts()
+    tag_counts = facet_counts["tag"]
 
     # If requesting only tags partial, return early with minimal context
     if partial == "tags":
@@ -48,27 +218,9 @@ def paper_list_partial(request):
         }
         return render(request, "papers/partials/paper_list/_paper_list_content.html", context)
 
-    # --- Base queryset (defer heavy fields) ---
-    papers = Paper.objects.only(
-        'id', 'title', 'authors', 'abstract', 'college', 
-        'program', 'year', 'tags', 'file'
-    ).all()
-
-    # --- Apply filters ---
-    if college:
-        papers = papers.filter(college=college)
-    if program:
-        papers = papers.filter(program=program)
-    if year:
-        try:
-            papers = papers.filter(year=int(year))
-        except (ValueError, TypeError):
-            pass
-    if tags:
-        tag_filters = Q()
-        for t in tags:
-            tag_filters |= Q(tags__contains=[t])
-        papers = papers.filter(tag_filters)
+    # --- Base queryset (defer heavy fields) + filters ---
+    text, search_filters = _search_request(request)
+    papers = _filtered_papers(search_filters, request.user)
 
     # --- Active filters ---
     active_filters = []
@@ -95,97 +247,71 @@ def paper_list_partial(request):
             "remove_url": query_dict.urlencode()
         })
 
-    # --- Determine saved papers ---
-    saved_paper_ids = []
-    if request.user.is_authenticated:
-        saved_paper_ids = list(request.user.saved_papers.values_list('paper_id', flat=True))
-
-    # --- Searching ---
+    # --- Searching (only the current page is materialized) ---
+    page_number = request.GET.get("page")
+    page_obj = None
+    result_count = None
+    next_cursor = None
+    suggestion = None
+    stream_url = None
     try:
-        if query:
-            # Author filter
-            if author_filter:
-                papers_by_author = Paper.objects.filter(authors__contains=[author_filter])[:10]
-                for paper in papers_by_author:
-                    snippet = extract_matching_snippet(
-                        paper.abstract or paper.summary or '', query or author_filter
-                    )
-                    paper.is_saved = paper.id in saved_paper_ids
-                    results.append({
-                        "query": query,
-                        "paper": paper,
-                        "snippet": snippet,
-                        "tags": paper.tags,
-                        "score": '-',
-                        "page": None,
-                    })
-                search_results = []
-            else:
-                print('Performing search for query:', query)
-                search_results = keyword_search(query)
-                if not search_results:
-                    print('No keyword search results, falling back to semantic search')
-                    search_results = semantic_search(query)
-
-            # Build result objects
-            paper_ids = [r.get("paper_id") for r in search_results]
-            papers_map = {p.id: p for p in papers.filter(id__in=paper_ids)}
-            for r in search_results:
-                paper = papers_map.get(r.get("paper_id"))
-                if not paper:
-                    continue
-                paper.is_saved = paper.id in saved_paper_ids
-                results.append({
-                    "query": query,
-                    "paper": paper,
-                    "snippet": r.get("text", ""),
-                    "tags": paper.tags,
-                    "score": f"{r.get('score', 0):.3f}" if r.get('score') is not None else "-",
-                    "page": r.get("page"),
-                })
+        if text:
+            if not page_number:
+                record_query(request.GET.get('q'))
+            hits = get_cached_results(text, search_filters)
+            if hits is None and page_number:
+                # Later pages need the final ranking (keyword + semantic tail)
+                hits = _search_hits(text, search_filters)
+            elif hits is None:
+                # Show keyword hits now. Only the fast stage is cached; the
+                # final list is written by _merged_hits (paper_list_stream
+                # when the first page has room, else the first later page)
+                hits = get_cached_results(text, search_filters, stage="fast")
+                if hits is None:
+                    hits = _fast_hits(text, search_filters)
+                    set_cached_results(text, search_filters, hits, stage="fast")
+                if len(hits) < PAPER_LIST_PAGE_SIZE:
+                    stream_params = request.GET.copy()
+                    stream_params.pop('page', None)
+                    stream_url = f"{reverse('paper_list_stream')}?{stream_params.urlencode()}"
+            if hits and hits[0].get("match_type") == "fuzzy":
+                suggestion = hits[0].get("did_you_mean")
+            elif not hits or hits[0].get("match_type") != "keyword":
+                suggestion = did_you_mean(text)
+            # Hits are an in-memory list, so numbered pages cost no COUNT(*)
+            paginator = Paginator(hits, PAPER_LIST_PAGE_SIZE)
+            page_obj = paginator.get_page(page_number)
+            page_obj.object_list = _hit_items(page_obj.object_list, query, request.user)
+            results = page_obj
+            result_count = paginator.count
         else:
-            # No query → just filtered papers
-            for paper in papers:
-                paper.is_saved = paper.id in saved_paper_ids
-                results.append({
-                    "query": query,
-                    "paper": paper,
-                    "snippet": "",
-                    "tags": paper.tags,
-                    "score": "-",
-                    "page": None,
-                })
+            # No free text → just filtered papers, newest first. Later pages
+            # are appended by paper_list_more from `next_cursor`
+            results, next_cursor = _browse_page(papers, query)
+            if active_filters:
+                result_count = papers.count()
 
     except Exception as e:
         import traceback
         traceback.print_exc()
-        for paper in papers:
-            snippet = extract_matching_snippet(paper.abstract or '', query or '')
-            paper.is_saved = paper.id in saved_paper_ids
-            results.append({
-                "query": query,
-                "paper": paper,
-                "snippet": snippet,
-                "tags": paper.tags,
-                "score": "-",
-                "page": None,
-            })
-    
-    # --- Pagination ---
-    paginator = Paginator(results, 20)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+        results, next_cursor = _browse_page(papers, text, snippets=True)
+        page_obj = None
+        result_count = len(results)
+        stream_url = None
 
     # --- Unique values for filters ---
-    colleges = Paper.objects.values_list('college', flat=True).distinct()
-    programs = Paper.objects.values_list('program', flat=True).distinct()
-    years = Paper.objects.values_list('year', flat=True).distinct()
-    years = sorted([y for y in years if y is not None], reverse=True)
+    colleges = sorted(facet_counts["college"])
+    programs = sorted(facet_counts["program"])
+    years = sorted(facet_counts["year"], reverse=True)
 
     context = {
-        "results": page_obj,
+        "results": results,
         "query": query,
         "page_obj": page_obj,
+        "result_count": result_count,
+        "next_cursor": next_cursor,
+        "did_you_mean": suggestion,
+        "stream_url": stream_url,
         "colleges": colleges,
         "programs": programs,
         "years": years,
@@ -196,15 +322,88 @@ def paper_list_partial(request):
         "active_filters": active_filters,
         "tag_counts": tag_counts,
         "view_mode": view_mode,
-        "is_infinite": is_infinite,  # Pass flag to template
+        "is_infinite": False,
     }
-
-    # For infinite scroll, use a minimal template that only returns the results
-    if is_infinite:
-        return render(request, "papers/partials/paper_list/_infinite_results.html", context)
-    
     return render(request, "papers/partials/paper_list/_paper_list_content.html", context)
 
+
+def paper_list_more(request):
+    """
+    Infinite-scroll endpoint: returns only the next slice of the paper list.
+
+    Browse mode uses keyset pagination on the primary key (`cursor` is the
+    last paper id shown), so loading page 500 costs the same as page 1.
+    Search mode pages through the cached ranked hits (`cursor` is the number
+    of hits already shown). No tag counts, filter choices or COUNT(*).
+    """
+    query = request.GET.get('q')
+    view_mode = request.GET.get('view_mode', 'card')
+    text, search_filters = _search_request(request)
+    try:
+        cursor = int(request.GET.get('cursor') or 0)
+    except (ValueError, TypeError):
+        cursor = 0
+
+    next_cursor = None
+    if text:
+        hits = _search_hits(text, search_filters)
+        page_hits = hits[cursor:cursor + PAPER_LIST_PAGE_SIZE]
+        items = _hit_items(page_hits, query, request.user)
+        if cursor + PAPER_LIST_PAGE_SIZE < len(hits):
+            next_cursor = cursor + PAPER_LIST_PAGE_SIZE
+    else:
+        items, next_cursor = _browse_page(_filtered_papers(search_filters, request.user), query, cursor)
+
+    context = {
+        "results": items,
+        "query": query,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "view_mode": view_mode,
+        "is_infinite": True,
+    }
+    return render(request, "papers/partials/paper_list/_infinite_results.html", context)
+
+def paper_list_stream(request):
+    """
+    Server-sent events for a library search whose first page was rendered
+    from keyword hits only. Runs semantic_search, sends a `semantic` event
+    that replaces the placeholder with the papers keyword search missed
+    (appended after the keyword hits), then `done`.
+
+    The merged hit list is cached, so pagination and infinite scroll see
+    the same ranking as the page.
+    """
+    query = request.GET.get('q')
+    view_mode = request.GET.get('view_mode', 'card')
+    text, search_filters = _search_request(request)
+
+    def events():
+        hits, extra = _merged_hits(text, search_filters) if text else ([], [])
+
+        shown = len(hits) - len(extra)
+        page_hits = extra[:PAPER_LIST_PAGE_SIZE - shown]
+        items = _hit_items(page_hits, query, request.user)
+        next_cursor = shown + len(page_hits) if shown + len(page_hits) < len(hits) else None
+        html = render_to_string("papers/partials/paper_list/_semantic_results.html", {
+            "results": items,
+            "query": query,
+            "cursor": shown,
+            "next_cursor": next_cursor,
+            "view_mode": view_mode,
+            "result_count": len(hits),
+            "is_infinite": True,
+        }, request=request)
+        yield _sse_event("semantic", html)
+        yield _sse_event("done", "")
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Don't let nginx buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def saved_papers_partial(request):
     saved = request.user.saved_papers.select_related(
@@ -234,14 +433,16 @@ def paper_detail_partials(request, pk):
     )
     # For non-user-specific sections, check cache first
     if not is_dynamic_request:
-        cache_key = f'paper_partials_{pk}'
+        # The fragment includes the user's save button (is_saved), so
+        # cache it per user; anonymous visitors share one entry
+        cache_key = f'paper_partials_{pk}:u{request.user.pk or 0}'
         cached_response = cache.get(cache_key)
         if cached_response:
             return cached_response
     
     # Cache miss or user-specific request - generate full response
     paper = (
-        Paper.objects
+        _with_saved_state(Paper.objects.all(), request.user)
         .prefetch_related(
             Prefetch(
                 "matched_citations",
@@ -295,12 +496,6 @@ def paper_detail_partials(request, pk):
     citation_count = paper.citation_count_cached
     matched_citation_count = paper.matched_count_cached
     
-    # === Saved State ===
-    is_saved = (
-        request.user.is_authenticated
-        and SavedPaper.objects.filter(paper=paper, user=request.user).exists()
-    )
-    
     context = {
         "paper": paper,
         "tags": paper.tags,
@@ -311,7 +506,7 @@ def paper_detail_partials(request, pk):
         "matched_citations": matched_citations,
         "matched_citation_count": matched_citation_count,
         "viewer_url": viewer_url,
-        "is_saved": is_saved,
+        "is_saved": paper.is_saved,
         "figures": figures,
     }
     
@@ -355,13 +550,8 @@ def insights_partial(request, chart_type):
         total_citations = MatchedCitation.objects.count()
         
         # Top author by number of papers
-        author_to_papers = {}
-        for p in papers:
-            for a in (p.authors or []):
-                if isinstance(a, str):
-                    author_to_papers.setdefault(a, 0)
-                    author_to_papers[a] += 1
-        top_author = max(author_to_papers.items(), key=lambda x: x[1])[0] if author_to_papers else "N/A"
+        author_counts = get_facet_counts()["author"]
+        top_author = next(iter(author_counts), "N/A")
         
         # Most cited paper
         paper_cite_counts = MatchedCitation.objects.values('matched_paper').annotate(c=Count('id')).order_by('-c').first()
@@ -377,15 +567,12 @@ def insights_partial(request, chart_type):
         })
     
     elif chart_type == 'tag_sidebar':
-        # Tag counts for sidebar
-        tags = [tag for paper in papers for tag in paper.tags]
-        tag_counts = dict(Counter(tags))
-        context['tag_counts'] = dict(sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:20])
+        # Tag counts for sidebar (facet counts are already best-first)
+        tag_counts = get_facet_counts()["tag"]
+        context['tag_counts'] = dict(list(tag_counts.items())[:20])
     
     elif chart_type == 'trending_tags':
-        tags = [tag for paper in papers for tag in paper.tags]
-        tag_counts = dict(Counter(tags))
-        sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+        sorted_tags = list(get_facet_counts()["tag"].items())[:10]
         
         context.update({
             'chart_id': 'tagsPieChart',
@@ -396,11 +583,8 @@ def insights_partial(request, chart_type):
         })
     
     elif chart_type == 'papers_per_year':
-        years = sorted({p.year for p in papers if p.year})
-        year_counts = {y: 0 for y in years}
-        for p in papers:
-            if p.year:
-                year_counts[p.year] = year_counts.get(p.year, 0) + 1
+        year_counts = get_facet_counts()["year"]
+        years = sorted(year_counts)
         
         context.update({
             'chart_id': 'trendLineChart',
@@ -427,20 +611,15 @@ def insights_partial(request, chart_type):
         context['top_cited_papers'] = top_cited_papers
     
     elif chart_type == 'tag_trends':
-        tags = [tag for paper in papers for tag in paper.tags]
-        tag_counts = Counter(tags)
-        years = sorted({p.year for p in papers if p.year})
+        facet_counts = get_facet_counts()
+        years = sorted(facet_counts["year"])
+        top_tag_names = list(facet_counts["tag"])[:5]
         
-        top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        top_tag_names = [t for t, _ in top_tags]
-        
-        tag_trends = {}
-        for tag in top_tag_names:
-            counts = []
-            for y in years:
-                c = Paper.objects.filter(year=y, tags__contains=[tag]).count()
-                counts.append(c)
-            tag_trends[tag] = counts
+        year_tag_counts = facet_counts["year_tag"]
+        tag_trends = {
+            tag: [year_tag_counts.get((y, tag), 0) for y in years]
+            for tag in top_tag_names
+        }
         
         context.update({
             'chart_id': 'tagTrendChart',
@@ -452,21 +631,18 @@ def insights_partial(request, chart_type):
         })
     
     elif chart_type == 'college_program':
-        programs = [p.program for p in papers if p.program]
-        prog_counts = Counter(programs)
-        top_programs = [p for p, c in prog_counts.most_common(5)]
-        
-        colleges = sorted(set([p.college for p in papers if p.college]))
+        facet_counts = get_facet_counts()
+        top_programs = list(facet_counts["program"])[:5]
+        colleges = sorted(facet_counts["college"])
         
-        college_program_matrix = []
-        for college in colleges:
-            row = []
-            for prog in top_programs:
-                row.append(Paper.objects.filter(college=college, program=prog).count())
-            college_program_matrix.append({
+        pair_counts = facet_counts["college_program"]
+        college_program_matrix = [
+            {
                 'college': college,
-                'counts': row,
-            })
+                'counts': [pair_counts.get((college, prog), 0) for prog in top_programs],
+            }
+            for college in colleges
+        ]
         
         context.update({
             'chart_id': 'collegeProgramChart',
@@ -1,10 +1,12 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.core.cache import cache
+from django.core.files import File
 from django.utils.html import escape
+from django.template.defaultfilters import linebreaksbr
 from django.conf import settings
 from django.utils.http import urlencode
 from django.db.models import Count, Sum
@@ -18,13 +20,21 @@ import os
 import fitz
 import json
 import random
-from collections import Counter
 from random import randint
 #from .task import process_paper_task
 from papers.models import Paper, SavedPaper, MatchedCitation, Tag
 from papers.forms import PaperForm
 from utils.extract_metadata_from_abstract import extract_metadata_from_abstract
 from utils.chm_to_html import merge_chm_to_html
+from utils.upload_staging import (
+    stage_upload,
+    finalize_staged_upload,
+    get_staged_upload,
+    load_staged_pages,
+    release_staged_upload,
+    discard_staged_upload,
+    extract_pdf_pages,
+)
 from utils.metadata_extractor import (
     extract_metadata as extract_metadata_from_pdf,
     normalize_college,
@@ -32,11 +42,13 @@ from utils.metadata_extractor import (
 )
 from utils.tagging import extract_tags, get_embedding_model
 from utils.semantic_search import index_paper, embed_paper_abstract, embed_paper_title
+from utils.autocomplete_index import get_index as get_autocomplete_index
+from utils.facets import get_facet_counts
 from utils.citation_matcher import extract_and_match_citations
 from utils.summarize import generate_summary_with_api
 from django.template.response import TemplateResponse
 import traceback
-from utils.single_paper_rag import query_rag # <-- Make sure this imports your modified function
+from utils.single_paper_rag import stream_query_rag
     
 def rag_chat_view(request):
     return TemplateResponse(request, "papers/partials/chat_messages.html")
@@ -66,23 +78,41 @@ def paper_query(request, pk):
     return JsonResponse({"error": "POST required"}, status=400)
 
 
-@require_GET  # This view is triggered by hx-get
+def _sse_event(event, html):
+    data = "".join(f"data: {line}\n" for line in html.splitlines() or [""])
+    return f"event: {event}\n{data}\n"
+
+
+@require_GET  # This view is opened by the "thinking" bubble's EventSource
 def get_answer(request, pk):
     """
-    HTMX endpoint that does the SLOW work.
-    It is loaded *by* the "thinking" bubble.
+    HTMX endpoint that does the SLOW work, as server-sent events.
+    `token` events append the answer text as the model generates it,
+    `answer` replaces the bubble with the finished answer, then `done`.
     """
     paper = get_object_or_404(Paper, pk=pk)
     user_query = request.GET.get("query", "").strip() # Get query from URL param
     if not user_query:
         return JsonResponse({"error": "Empty query"}, status=400)
 
-    answer = query_rag(paper.id, user_query)
+    def events():
+        parts = []
+        for text in stream_query_rag(paper.id, user_query):
+            parts.append(text)
+            yield _sse_event("token", linebreaksbr(text))
 
-    # Return the *answer* partial
-    return render(request, "papers/partials/answer_bubble.html", {
-        "answer": answer,
-    })
+        # Return the *answer* partial
+        html = render_to_string("papers/partials/answer_bubble.html", {
+            "answer": "".join(parts),
+        }, request=request)
+        yield _sse_event("answer", html)
+        yield _sse_event("done", "")
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Don't let nginx buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 def home(request):
@@ -169,67 +199,27 @@ def autocomplete(request):
         limit = 10
 
     # Per-section hard limit (user requested 5 per section)
-    per_section_limit = 5
-
-    cache_key = f"autocomplete:{q.lower()}:{limit}"
-    results = None
-    try:
-        results = cache.get(cache_key)
-    except Exception:
-        results = None
-
-    if results is not None:
-        # cached structure is expected to be {'papers': [...], 'authors': [...]}
-        if is_htmx:
-            return render(request, 'partials/autocomplete_list.html', {
-                'papers': results.get('papers', []),
-                'authors': results.get('authors', []),
-                'query': q,
-            })
-        return JsonResponse(results)
-
-    # Build separate lists for papers and authors
-    papers_list = []
-    authors_list = []
-
-    # 1) Titles (exact substring match) - up to `limit` results
-    title_qs = Paper.objects.filter(title__icontains=q).values('id', 'title')[:limit]
-    for t in title_qs:
-        papers_list.append({
-            'paper_id': t['id'],
-            'value': t['title'],
-            'display': highlight_text(t['title'], q),
-        })
-
-    # 2) Authors (search in JSON list; fall back to Python-side filter)
-    if True:
-        candidate_qs = Paper.objects.exclude(authors__isnull=True).values('id', 'authors')[:1000]
-        seen_authors = set()
-        for item in candidate_qs:
-            authors = item.get('authors') or []
-            for a in authors:
-                if not isinstance(a, str):
-                    continue
-                if q.lower() in a.lower() and a not in seen_authors:
-                    seen_authors.add(a)
-                    authors_list.append({
-                        'value': a,
-                        'display': highlight_text(a, q),
-                    })
-                    if len(authors_list) >= limit:
-                        break
-            if len(authors_list) >= limit:
-                break
-
-    # trim and package
-    papers_list = papers_list[:per_section_limit]
-    authors_list = authors_list[:per_section_limit]
-
+    per_section_limit = min(limit, 5)
+
+    # Titles and authors come from the in-process substring index
+    # (utils/autocomplete_index.py), so keystrokes never hit the database
+    title_hits, author_hits = get_autocomplete_index().search(q, limit=per_section_limit)
+    papers_list = [
+        {
+            'paper_id': paper_id,
+            'value': title,
+            'display': highlight_text(title, q),
+        }
+        for paper_id, title in title_hits
+    ]
+    authors_list = [
+        {
+            'value': a,
+            'display': highlight_text(a, q),
+        }
+        for a in author_hits
+    ]
     res_struct = {'papers': papers_list, 'authors': authors_list}
-    try:
-        cache.set(cache_key, res_struct, timeout=30)
-    except Exception:
-        pass
 
     if is_htmx:
         return render(request, 'partials/autocomplete_list.html', {
@@ -300,10 +290,11 @@ def paper_detail(request, pk):
         
     return render(request, "papers/paper_detail_container.html", context)
 
-def process_paper_synchronously(paper):
+def process_paper_synchronously(paper, pages=None):
     """
     Process uploaded paper synchronously (no Celery).
     Runs HEAVY processing steps: embeddings, indexing, tags, summary, citations.
+    `pages` is the per-page PDF text from a staged upload, if there is one.
     """
     try:
         print(f"[Sync] Processing paper ID: {paper.id}")
@@ -325,7 +316,7 @@ def process_paper_synchronously(paper):
         # --- STEP 2: Semantic Search Indexing ---
         try:
             print("[Sync] Indexing paper for semantic search")
-            index_paper(paper)
+            index_paper(paper, pages=pages)
             paper.is_indexed = True
             paper.save(update_fields=["is_indexed"])
             print("[Sync] Paper indexed successfully")
@@ -424,11 +415,29 @@ def paper_upload(request):
         if form.is_valid():
             print("[3] Form is valid")
             
+            # Reuse the file staged by the metadata preview, if any
+            upload_token = form.cleaned_data.get("upload_token")
+            staged = None
+            if upload_token and not request.FILES.get("file"):
+                staged = get_staged_upload(upload_token, user=request.user)
+                if staged is None:
+                    print(f"[3b] Upload token {upload_token} expired or unknown")
+                    form.add_error("file", "Your uploaded file has expired. Please upload it again.")
+
+        if form.is_valid():
             # Save the paper with user's input
             paper = form.save(commit=False)
             paper.uploaded_by = request.user
             paper.is_indexed = False
             paper.status = "processing"
+
+            pages = None
+            if staged:
+                with open(staged["path"], "rb") as staged_file:
+                    paper.file.save(staged["filename"], File(staged_file), save=False)
+                pages = load_staged_pages(staged)
+                print(f"[4a] Attached staged upload {upload_token}")
+
             paper.save()
             
             print(f"[4] Saved new Paper object with ID {paper.id}")
@@ -440,9 +449,13 @@ def paper_upload(request):
             if ext == ".chm":
                 print("[9] Processing CHM synchronously")
                 try:
-                    merged_html_path, _ = merge_chm_to_html(
-                        paper.file.path, settings.MEDIA_ROOT
-                    )
+                    if staged and staged.get("merged_html_path") and os.path.exists(staged["merged_html_path"]):
+                        merged_html_path = staged["merged_html_path"]
+                        print("[10] Reusing merged HTML from preview")
+                    else:
+                        merged_html_path, _ = merge_chm_to_html(
+                            paper.file.path, settings.MEDIA_ROOT
+                        )
                     print(f"[10] CHM merged HTML path: {merged_html_path}")
 
                     # Save relative path to model
@@ -454,10 +467,13 @@ def paper_upload(request):
                 except Exception as e:
                     print(f"[CHM Merge Error] {e}")
 
+            if staged:
+                release_staged_upload(upload_token)
+
             # --- REPLACED: Run processing synchronously instead of Celery task ---
             print(f"[14] Starting synchronous processing for paper ID {paper.id}")
             try:
-                process_paper_synchronously(paper)
+                process_paper_synchronously(paper, pages=pages)
                 print(f"[15] Synchronous processing completed for paper ID {paper.id}")
             except Exception as e:
                 print(f"[15] Synchronous processing failed for paper ID {paper.id}: {e}")
@@ -578,7 +594,14 @@ def pdf_viewer(request, pk):
         'pdf_url': paper.pdf_file.url  # e.g., "/media/papers/sample.pdf"
     })
 
+@login_required
 def extract_metadata(request):
+    """
+    Metadata preview for the upload form.
+    The uploaded file is kept under an expiring upload token (together with
+    its extracted page text or merged CHM html) so that `paper_upload` can
+    attach it by token instead of receiving and parsing it again.
+    """
     print("[Extract Metadata] Entered view")  # DEBUG
     if request.method != "POST":
         return JsonResponse({"success": False, "error": "Only POST method allowed"}, status=405)
@@ -590,26 +613,22 @@ def extract_metadata(request):
     filename = uploaded_file.name
     ext = os.path.splitext(filename)[1].lower()
 
-    # --- DEFINE ALL TEMP PATHS HERE ---
-    temp_path = os.path.join(settings.MEDIA_ROOT, f"temp_upload_{filename}")
-    merged_html_path = None  # <-- Initialize CHM path as None
-
-    print(f"[Extract Metadata] Saving temp file to {temp_path}")  # DEBUG
+    token, temp_path = stage_upload(uploaded_file, user=request.user)
+    print(f"[Extract Metadata] Staged temp file at {temp_path}")  # DEBUG
 
     try:
-        with open(temp_path, "wb+") as destination:
-            for chunk in uploaded_file.chunks():
-                destination.write(chunk)
-
         metadata = {}
+        pages = None
+        merged_html_path = None
+
         if ext in [".pdf", ".docx"]:
             print("[Extract Metadata] PDF/DOCX detected, extracting metadata...")  # DEBUG
             metadata = extract_metadata_from_pdf(temp_path)
+            if ext == ".pdf":
+                pages = extract_pdf_pages(temp_path)
 
         elif ext == ".chm":
             print("[Extract Metadata] CHM detected, merging CHM...")  # DEBUG
-            
-            # --- This will now assign to the variable defined outside the try block ---
             merged_html_path, _ = merge_chm_to_html(temp_path, settings.MEDIA_ROOT)
             
             print(f"[Extract Metadata] CHM merged to {merged_html_path}")  # DEBUG
@@ -623,50 +642,32 @@ def extract_metadata(request):
         metadata["college"] = normalize_college(raw_college)
         metadata["program"] = normalize_program(raw_program)
 
+        finalize_staged_upload(
+            token,
+            metadata=metadata,
+            pages=pages,
+            merged_html_path=merged_html_path,
+        )
+
         print(f"[Extract Metadata] Final metadata: {metadata}")  # DEBUG
-        return JsonResponse({"success": True, "metadata": metadata})
+        return JsonResponse({"success": True, "metadata": metadata, "upload_token": token})
 
     except Exception as e:
         print(f"[Extract Metadata ERROR] {e}")
+        discard_staged_upload(token)
         return JsonResponse({"success": False, "error": str(e)}, status=500)
-
-    finally:
-        # --- UPDATED FINALLY BLOCK ---
-        
-        # 1. Delete the initial temp file
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-                print(f"[Extract Metadata] Temp file removed: {temp_path}")  # DEBUG
-            except Exception as e:
-                # Log error but don't crash
-                print(f"[Extract Metadata Cleanup Error] Failed to remove {temp_path}: {e}")
-
-        # 2. Delete the secondary CHM temp file, if it was created
-        if merged_html_path and os.path.exists(merged_html_path):
-            try:
-                os.remove(merged_html_path)
-                print(f"[Extract Metadata] Merged CHM file removed: {merged_html_path}")  # DEBUG
-            except Exception as e:
-                # Log error but don't crash
-                print(f"[Extract Metadata Cleanup Error] Failed to remove {merged_html_path}: {e}")
     
 
 def paper_insights(request):
-    papers = Paper.objects.all()
-    tags = [tag for paper in papers for tag in paper.tags]
-    tag_counts = dict(Counter(tags))
+    facet_counts = get_facet_counts()
+    tag_counts = facet_counts["tag"]
 
     tag_labels = list(tag_counts.keys())
     tag_values = list(tag_counts.values())
 
     # Trend: number of papers per year
-    years = sorted({p.year for p in papers if p.year})
-    year_counts = {y: 0 for y in years}
-    for p in papers:
-        if p.year:
-            year_counts[p.year] = year_counts.get(p.year, 0) + 1
-    year_labels = years
+    year_counts = facet_counts["year"]
+    year_labels = sorted(year_counts)
     year_values = [year_counts.get(y, 0) for y in year_labels]
 
     # Top authors by number of papers and compute average citations per author
@@ -678,12 +679,13 @@ def paper_insights(request):
         if pid:
             paper_cite_counts[pid] = row.get('c', 0)
 
+    # Per-paper citations are needed for the averages; only ids and authors are loaded
     author_to_papers = {}
-    for p in papers:
-        for a in (p.authors or []):
+    for pid, authors in Paper.objects.values_list('id', 'authors').iterator():
+        for a in (authors or []):
             if not isinstance(a, str):
                 continue
-            author_to_papers.setdefault(a, []).append(p.id)
+            author_to_papers.setdefault(a, []).append(pid)
 
     author_stats = []
     for a, pids in author_to_papers.items():
@@ -702,30 +704,24 @@ def paper_insights(request):
     avg_author_values = [round(avg, 2) for a, n, avg in top_by_avg]
 
     # Tag trend over time: pick top tags and compute counts per year
-    top_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    top_tag_names = [t for t, _ in top_tags]
-    tag_trends = {}
-    for tag in top_tag_names:
-        counts = []
-        for y in year_labels:
-            c = Paper.objects.filter(year=y, tags__contains=[tag]).count()
-            counts.append(c)
-        tag_trends[tag] = counts
+    top_tag_names = list(tag_counts)[:5]
+    year_tag_counts = facet_counts["year_tag"]
+    tag_trends = {
+        tag: [year_tag_counts.get((y, tag), 0) for y in year_labels]
+        for tag in top_tag_names
+    }
 
     # Papers by college/program: choose top programs and compute counts per college
-    programs = [p.program for p in papers if p.program]
-    prog_counts = Counter(programs)
-    top_programs = [p for p,c in prog_counts.most_common(5)]
-    colleges = sorted(set([p.college for p in papers if p.college]))
-    college_program_matrix = []
-    for college in colleges:
-        row = []
-        for prog in top_programs:
-            row.append(Paper.objects.filter(college=college, program=prog).count())
-        college_program_matrix.append({
+    top_programs = list(facet_counts["program"])[:5]
+    colleges = sorted(facet_counts["college"])
+    pair_counts = facet_counts["college_program"]
+    college_program_matrix = [
+        {
             'college': college,
-            'counts': row,
-        })
+            'counts': [pair_counts.get((college, prog), 0) for prog in top_programs],
+        }
+        for college in colleges
+    ]
 
     insights = {
         'tag_labels': tag_labels,
@@ -743,7 +739,7 @@ def paper_insights(request):
         'college_program_matrix': college_program_matrix,
         # papers per college
         'college_labels': colleges,
-        'college_values': [Paper.objects.filter(college=c).count() for c in colleges],
+        'college_values': [facet_counts["college"][c] for c in colleges],
     }
 
     # Top cited papers (ordered)
@@ -14,6 +14,23 @@ class SearchSettingsForm(forms.ModelForm):
             'min_similarity_score',
             'bm25_weight', 
             'vector_weight',
+            'fusion_method',
+            'rrf_k',
+            'bm25_k1',
+            'bm25_b',
+            'paper_shortlist_size',
+            'vector_backend',
+            'vector_store_nprobe',
+            'hnsw_m',
+            'hnsw_ef_construction',
+            'hnsw_ef_search',
+            'chunk_field_weight',
+            'title_field_weight',
+            'abstract_field_weight',
+            'rerank_enabled',
+            'rerank_model_name',
+            'rerank_top_n',
+            'rerank_budget_ms',
             'max_chunks_scan', 
             'hybrid_search_multiplier',
             'hybrid_search_min_results',
@@ -21,6 +38,9 @@ class SearchSettingsForm(forms.ModelForm):
             'tag_extraction_min_score',
             'tag_cache_timeout',
             'settings_cache_timeout', # <-- Make sure this field exists in the form
+            'search_cache_timeout',
+            'warmup_query_count',
+            'warmup_queries',
         ]
         widgets = {
             'embedding_model_name': forms.TextInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
@@ -31,6 +51,22 @@ class SearchSettingsForm(forms.ModelForm):
             'min_similarity_score': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.01'}),
             'bm25_weight': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.1'}),
             'vector_weight': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.1'}),
+            'fusion_method': forms.Select(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'rrf_k': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'bm25_k1': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.05'}),
+            'bm25_b': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.05'}),
+            'vector_backend': forms.Select(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'vector_store_nprobe': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'hnsw_m': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'hnsw_ef_construction': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'hnsw_ef_search': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'chunk_field_weight': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.1'}),
+            'title_field_weight': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.1'}),
+            'abstract_field_weight': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.1'}),
+            'rerank_model_name': forms.TextInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'rerank_top_n': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'rerank_budget_ms': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'paper_shortlist_size': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
             'max_chunks_scan': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
             'hybrid_search_multiplier': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
             'hybrid_search_min_results': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
@@ -38,6 +74,9 @@ class SearchSettingsForm(forms.ModelForm):
             'tag_extraction_min_score': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'step': '0.01'}),
             'tag_cache_timeout': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
             'settings_cache_timeout': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'search_cache_timeout': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'warmup_query_count': forms.NumberInput(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2'}),
+            'warmup_queries': forms.Textarea(attrs={'class': 'w-full border border-gray-200 dark:border-zinc-700 rounded-lg p-2', 'rows': 4}),
         }
 
 class LlamaSettingsForm(forms.ModelForm):
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:12
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0005_searchsettings_embedding_model_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='search_cache_timeout',
+            field=models.IntegerField(default=600, help_text='How long to cache search results (seconds). 0 disables the cache.', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(86400)]),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Bumped on every save; part of the search result cache key'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:20
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0006_searchsettings_search_cache_timeout_and_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='bm25_k1',
+            field=models.FloatField(default=1.2, help_text='BM25 term frequency saturation (k1)', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(3.0)]),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='bm25_b',
+            field=models.FloatField(default=0.75, help_text='BM25 chunk length normalization (b)', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+    ]
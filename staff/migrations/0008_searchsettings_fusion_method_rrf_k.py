@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:02
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0007_searchsettings_bm25_k1_bm25_b'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='fusion_method',
+            field=models.CharField(choices=[('rrf', 'Reciprocal rank fusion'), ('weighted', 'Normalized weighted scores')], default='rrf', help_text='How keyword (BM25) and vector candidates are combined in hybrid search', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='rrf_k',
+            field=models.IntegerField(default=60, help_text='Rank constant k for reciprocal rank fusion', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1000)]),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:40
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0008_searchsettings_fusion_method_rrf_k'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='paper_shortlist_size',
+            field=models.IntegerField(default=50, help_text='Papers shortlisted by centroid before ranking their chunks. 0 searches all chunks.', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1000)]),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0009_searchsettings_paper_shortlist_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='vector_backend',
+            field=models.CharField(choices=[('pgvector', 'pgvector (database)'), ('numpy', 'Memory-mapped NumPy store')], default='pgvector', help_text='Where unfiltered vector search runs. The NumPy store must be built with build_vector_store.', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='vector_store_nprobe',
+            field=models.IntegerField(default=8, help_text='IVF lists scanned per query in the NumPy store', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(256)]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:30
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0010_searchsettings_vector_backend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='hnsw_m',
+            field=models.IntegerField(default=16, help_text='HNSW graph degree (m). Applied when the index is rebuilt (hnsw_report --rebuild).', validators=[django.core.validators.MinValueValidator(2), django.core.validators.MaxValueValidator(100)]),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='hnsw_ef_construction',
+            field=models.IntegerField(default=64, help_text='HNSW build candidate list size. Applied when the index is rebuilt.', validators=[django.core.validators.MinValueValidator(4), django.core.validators.MaxValueValidator(1000)]),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='hnsw_ef_search',
+            field=models.IntegerField(default=40, help_text='HNSW query candidate list size, set per query (raised to the fetch limit when lower)', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1000)]),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0011_searchsettings_hnsw_params'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='rerank_enabled',
+            field=models.BooleanField(default=False, help_text='Rerank the top search and chat candidates with a local cross-encoder (needs sentence-transformers)'),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='rerank_model_name',
+            field=models.CharField(default='cross-encoder/ms-marco-MiniLM-L-6-v2', help_text='HuggingFace repo ID or local path of the cross-encoder', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='rerank_top_n',
+            field=models.IntegerField(default=20, help_text='First-stage candidates scored by the cross-encoder', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(200)]),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='rerank_budget_ms',
+            field=models.IntegerField(default=150, help_text='Time budget for reranking (ms). Unscored candidates keep their first-stage order.', validators=[django.core.validators.MinValueValidator(10), django.core.validators.MaxValueValidator(5000)]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0012_searchsettings_rerank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='chunk_field_weight',
+            field=models.FloatField(default=1.0, help_text='Weight of the best chunk match when fusing fields in semantic search', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='title_field_weight',
+            field=models.FloatField(default=0.5, help_text='Weight of the title embedding match. 0 skips the title search.', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='abstract_field_weight',
+            field=models.FloatField(default=0.5, help_text='Weight of the abstract embedding match. 0 skips the abstract search.', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)]),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:40
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0013_searchsettings_field_weights'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchsettings',
+            name='warmup_query_count',
+            field=models.IntegerField(default=20, help_text='Most frequent logged searches replayed by the cache warm-up. 0 uses only the curated list.', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(200)]),
+        ),
+        migrations.AddField(
+            model_name='searchsettings',
+            name='warmup_queries',
+            field=models.TextField(blank=True, default='', help_text='Curated searches to warm up, one per line (run before the logged ones)'),
+        ),
+    ]
@@ -51,6 +51,93 @@ class SearchSettings(models.Model):
         help_text="Weight for vector similarity"
     )
     
+    fusion_method = models.CharField(
+        max_length=20,
+        default="rrf",
+        choices=[("rrf", "Reciprocal rank fusion"), ("weighted", "Normalized weighted scores")],
+        help_text="How keyword (BM25) and vector candidates are combined in hybrid search"
+    )
+    rrf_k = models.IntegerField(
+        default=60,
+        validators=[MinValueValidator(1), MaxValueValidator(1000)],
+        help_text="Rank constant k for reciprocal rank fusion"
+    )
+    bm25_k1 = models.FloatField(
+        default=1.2,
+        validators=[MinValueValidator(0.0), MaxValueValidator(3.0)],
+        help_text="BM25 term frequency saturation (k1)"
+    )
+    bm25_b = models.FloatField(
+        default=0.75,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="BM25 chunk length normalization (b)"
+    )
+    paper_shortlist_size = models.IntegerField(
+        default=50,
+        validators=[MinValueValidator(0), MaxValueValidator(1000)],
+        help_text="Papers shortlisted by centroid before ranking their chunks. 0 searches all chunks."
+    )
+    vector_backend = models.CharField(
+        max_length=20,
+        default="pgvector",
+        choices=[("pgvector", "pgvector (database)"), ("numpy", "Memory-mapped NumPy store")],
+        help_text="Where unfiltered vector search runs. The NumPy store must be built with build_vector_store."
+    )
+    vector_store_nprobe = models.IntegerField(
+        default=8,
+        validators=[MinValueValidator(1), MaxValueValidator(256)],
+        help_text="IVF lists scanned per query in the NumPy store"
+    )
+    hnsw_m = models.IntegerField(
+        default=16,
+        validators=[MinValueValidator(2), MaxValueValidator(100)],
+        help_text="HNSW graph degree (m). Applied when the index is rebuilt (hnsw_report --rebuild)."
+    )
+    hnsw_ef_construction = models.IntegerField(
+        default=64,
+        validators=[MinValueValidator(4), MaxValueValidator(1000)],
+        help_text="HNSW build candidate list size. Applied when the index is rebuilt."
+    )
+    hnsw_ef_search = models.IntegerField(
+        default=40,
+        validators=[MinValueValidator(1), MaxValueValidator(1000)],
+        help_text="HNSW query candidate list size, set per query (raised to the fetch limit when lower)"
+    )
+    chunk_field_weight = models.FloatField(
+        default=1.0,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="Weight of the best chunk match when fusing fields in semantic search"
+    )
+    title_field_weight = models.FloatField(
+        default=0.5,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="Weight of the title embedding match. 0 skips the title search."
+    )
+    abstract_field_weight = models.FloatField(
+        default=0.5,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        help_text="Weight of the abstract embedding match. 0 skips the abstract search."
+    )
+    rerank_enabled = models.BooleanField(
+        default=False,
+        help_text="Rerank the top search and chat candidates with a local cross-encoder (needs sentence-transformers)"
+    )
+    rerank_model_name = models.CharField(
+        max_length=255,
+        default="cross-encoder/ms-marco-MiniLM-L-6-v2",
+        help_text="HuggingFace repo ID or local path of the cross-encoder"
+    )
+    rerank_top_n = models.IntegerField(
+        default=20,
+        validators=[MinValueValidator(0), MaxValueValidator(200)],
+        help_text="First-stage candidates scored by the cross-encoder"
+    )
+    rerank_budget_ms = models.IntegerField(
+        default=150,
+        validators=[MinValueValidator(10), MaxValueValidator(5000)],
+        help_text="Time budget for reranking (ms). Unscored candidates keep their first-stage order."
+    )
+    
     # Keyword search settings
     max_chunks_scan = models.IntegerField(
         default=2000,
@@ -85,12 +172,35 @@ class SearchSettings(models.Model):
         default=900, 
         help_text="How long to cache these settings (seconds). 15 min = 900."
     )
+    search_cache_timeout = models.IntegerField(
+        default=600,
+        validators=[MinValueValidator(0), MaxValueValidator(86400)],
+        help_text="How long to cache search results (seconds). 0 disables the cache."
+    )
+    warmup_query_count = models.IntegerField(
+        default=20,
+        validators=[MinValueValidator(0), MaxValueValidator(200)],
+        help_text="Most frequent logged searches replayed by the cache warm-up. 0 uses only the curated list."
+    )
+    warmup_queries = models.TextField(
+        blank=True,
+        default="",
+        help_text="Curated searches to warm up, one per line (run before the logged ones)"
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Bumped on every save; part of the search result cache key"
+    )
     class Meta:
         verbose_name_plural = "Search Settings"
     
     def save(self, *args, **kwargs):
         from django.core.cache import cache
         self.pk = 1  
+        if self.version is None:
+            self.version = 1
+        self.version += 1
         cache.delete('active_search_settings') 
         super().save(*args, **kwargs)
     
@@ -0,0 +1,257 @@
+# utils/autocomplete_index.py
+# Per-process substring index for the search box autocomplete.
+#
+# Titles and author names are normalized (lowercase, accents stripped) and
+# posted under every trigram they contain, plus one- and two-letter word
+# prefixes for very short input. A keystroke intersects the posting sets of
+# the query's grams and verifies the few survivors, so lookups never touch
+# the database.
+#
+# The index is built on first use in each worker, kept current in this
+# process by the Paper post_save/post_delete signals, and rebuilt in a
+# background thread after AUTOCOMPLETE_INDEX_TTL seconds to pick up changes
+# made by other workers (the old index keeps serving meanwhile). Signal
+# updates that arrive while a build reads the table are replayed onto the
+# new index when it is swapped in.
+
+import heapq
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.db import connection
+
+AUTOCOMPLETE_INDEX_TTL = 300
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def _grams(norm):
+    grams = {norm[i:i + 3] for i in range(len(norm) - 2)}
+    for word in norm.split():
+        grams.add("^" + word[:1])
+        grams.add("^" + word[:2])
+    return grams
+
+
+def _query_grams(q):
+    if len(q) < 3:
+        return {"^" + q}
+    return {q[i:i + 3] for i in range(len(q) - 2)}
+
+
+def _rank(norm, q):
+    """Whole-string prefix, then word prefix, then any substring; shorter first."""
+    if norm.startswith(q):
+        position = 0
+    elif (" " + q) in (" " + norm):
+        position = 1
+    else:
+        position = 2
+    return (position, len(norm))
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.titles = {}          # paper_id -> (title, normalized title)
+        self.paper_authors = {}   # paper_id -> [normalized author names]
+        self.authors = {}         # normalized name -> [display name, paper count]
+        self._postings = defaultdict(set)
+        # Results for 1-2 letter queries match thousands of entries; memoize them
+        self._short_results = {}
+        self.built_at = None
+        # Signal updates seen while build() runs, replayed after the swap
+        self._pending = None
+
+    # --- maintenance -------------------------------------------------------
+
+    def _post(self, key, norm):
+        for gram in _grams(norm):
+            self._postings[gram].add(key)
+
+    def _unpost(self, key, norm):
+        for gram in _grams(norm):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def add_paper(self, paper_id, title, authors):
+        with self._lock:
+            self.remove_paper(paper_id)
+            self._short_results.clear()
+            norm_title = normalize(title)
+            if norm_title:
+                self.titles[paper_id] = (title, norm_title)
+                self._post(("t", paper_id), norm_title)
+
+            names = []
+            for name in authors or []:
+                if not isinstance(name, str):
+                    continue
+                norm = normalize(name)
+                if not norm or norm in names:
+                    continue
+                names.append(norm)
+                entry = self.authors.get(norm)
+                if entry is None:
+                    self.authors[norm] = [name.strip(), 1]
+                    self._post(("a", norm), norm)
+                else:
+                    entry[1] += 1
+            self.paper_authors[paper_id] = names
+
+    def remove_paper(self, paper_id):
+        with self._lock:
+            self._short_results.clear()
+            title = self.titles.pop(paper_id, None)
+            if title:
+                self._unpost(("t", paper_id), title[1])
+            for norm in self.paper_authors.pop(paper_id, []):
+                entry = self.authors.get(norm)
+                if entry is None:
+                    continue
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self.authors[norm]
+                    self._unpost(("a", norm), norm)
+
+    def build(self):
+        from papers.models import Paper
+
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            fresh = AutocompleteIndex()
+            for paper_id, title, authors in Paper.objects.values_list("id", "title", "authors").iterator():
+                fresh.add_paper(paper_id, title, authors)
+            with self._lock:
+                self.titles = fresh.titles
+                self.paper_authors = fresh.paper_authors
+                self.authors = fresh.authors
+                self._postings = fresh._postings
+                self._short_results = {}
+                self.built_at = time.time()
+                # The table read may predate these; add/remove are idempotent
+                for method, args in self._pending:
+                    getattr(self, method)(*args)
+        finally:
+            with self._lock:
+                self._pending = None
+        print(
+            f"[Autocomplete] Indexed {len(self.titles)} titles and {len(self.authors)} authors "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    def apply(self, method, *args):
+        """Signal update: apply it now and, during a build, again after the swap."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((method, args))
+            getattr(self, method)(*args)
+
+    @property
+    def is_building(self):
+        return self._pending is not None
+
+    @property
+    def is_stale(self):
+        return self.built_at is None or time.time() - self.built_at > AUTOCOMPLETE_INDEX_TTL
+
+    # --- lookup ------------------------------------------------------------
+
+    def search(self, q, limit=5):
+        """Return ([(paper_id, title), ...], [author name, ...]) best-first."""
+        q = normalize(q)
+        if not q:
+            return [], []
+
+        with self._lock:
+            if len(q) < 3 and (q, limit) in self._short_results:
+                return self._short_results[(q, limit)]
+            postings = sorted(
+                (self._postings.get(gram, set()) for gram in _query_grams(q)), key=len
+            )
+            if not postings or not postings[0]:
+                return [], []
+            keys = set(postings[0])
+            for posting in postings[1:]:
+                keys &= posting
+                if not keys:
+                    return [], []
+
+            titles, authors = [], []
+            for kind, value in keys:
+                if kind == "t":
+                    title, norm = self.titles[value]
+                    if q in norm:
+                        titles.append((_rank(norm, q), value, title))
+                else:
+                    if q in value:
+                        display, count = self.authors[value]
+                        authors.append((_rank(value, q), -count, display))
+
+            results = (
+                [(paper_id, title) for _, paper_id, title in heapq.nsmallest(limit, titles)],
+                [display for _, _, display in heapq.nsmallest(limit, authors)],
+            )
+            if len(q) < 3:
+                self._short_results[(q, limit)] = results
+        return results
+
+
+_index = AutocompleteIndex()
+_build_lock = threading.Lock()
+_rebuilding = False
+
+
+def _rebuild_in_background():
+    global _rebuilding
+    try:
+        with _build_lock:
+            _index.build()
+    except Exception as e:
+        print(f"[Autocomplete] Rebuild failed, keeping the old index: {e}")
+    finally:
+        _rebuilding = False
+        # Threads don't share the request cycle's connection cleanup
+        connection.close()
+
+
+def get_index():
+    """
+    The process-wide index. Built synchronously only when missing; once it is
+    older than the TTL, requests keep using it while a background thread
+    builds the replacement and swaps it in.
+    """
+    global _rebuilding
+    if _index.built_at is None:
+        with _build_lock:
+            if _index.built_at is None:
+                _index.build()
+    elif _index.is_stale and not _rebuilding:
+        with _build_lock:
+            if _rebuilding or not _index.is_stale:
+                return _index
+            _rebuilding = True
+        threading.Thread(target=_rebuild_in_background, name="autocomplete-rebuild", daemon=True).start()
+    return _index
+
+
+def index_paper(paper):
+    """Signal hook: refresh one paper in this process's index (if built or building)."""
+    if _index.built_at is not None or _index.is_building:
+        _index.apply("add_paper", paper.id, paper.title, paper.authors)
+
+
+def unindex_paper(paper_id):
+    if _index.built_at is not None or _index.is_building:
+        _index.apply("remove_paper", paper_id)
@@ -0,0 +1,201 @@
+# utils/bm25.py
+# Okapi BM25 over PaperChunk.search_vector.
+#
+# Corpus statistics live in SearchTermStat (document frequency per lexeme)
+# and SearchCorpusStat (chunk count + total tokens). They are updated
+# incrementally whenever chunks are inserted or deleted, and scoring runs as
+# a single SQL statement over the GIN-matched candidate chunks.
+
+from django.db import connection, transaction
+from papers.models import PaperChunk, SearchTermStat, SearchCorpusStat
+from staff.utils import get_search_settings
+from utils import chunk_matrix_cache, vector_store
+
+FTS_CONFIG = 'english'
+
+# Token count of one chunk = number of positions stored in its tsvector
+_TOKEN_COUNT_SQL = """
+    COALESCE((
+        SELECT SUM(COALESCE(array_length(u.positions, 1), 1))
+        FROM unnest(c.search_vector) u
+    ), 0)
+"""
+
+
+def _ids_sql(chunk_qs):
+    sql, params = chunk_qs.order_by().values('id').query.sql_with_params()
+    return sql, list(params)
+
+
+def add_chunks_to_stats(chunk_qs):
+    """
+    Fold freshly inserted chunks into the corpus statistics
+    (call right after bulk_create).
+    """
+    ids_sql, ids_params = _ids_sql(chunk_qs)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE papers_paperchunk c SET token_count = {_TOKEN_COUNT_SQL} WHERE c.id IN ({ids_sql})",
+            ids_params,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO papers_searchtermstat (term, doc_freq)
+            SELECT u.lexeme, COUNT(*)
+            FROM papers_paperchunk c CROSS JOIN LATERAL unnest(c.search_vector) u
+            WHERE c.id IN ({ids_sql})
+            GROUP BY u.lexeme
+            ON CONFLICT (term) DO UPDATE
+                SET doc_freq = papers_searchtermstat.doc_freq + EXCLUDED.doc_freq
+            """,
+            ids_params,
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO papers_searchcorpusstat (id, chunk_count, total_tokens)
+            SELECT 1, COUNT(*), COALESCE(SUM(c.token_count), 0)
+            FROM papers_paperchunk c WHERE c.id IN ({ids_sql})
+            ON CONFLICT (id) DO UPDATE
+                SET chunk_count = papers_searchcorpusstat.chunk_count + EXCLUDED.chunk_count,
+                    total_tokens = papers_searchcorpusstat.total_tokens + EXCLUDED.total_tokens
+            """,
+            ids_params,
+        )
+
+
+def remove_chunks_from_stats(chunk_qs):
+    """Subtract chunks that are about to be deleted from the corpus statistics."""
+    ids_sql, ids_params = _ids_sql(chunk_qs)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE papers_searchtermstat t
+            SET doc_freq = t.doc_freq - d.n
+            FROM (
+                SELECT u.lexeme, COUNT(*) AS n
+                FROM papers_paperchunk c CROSS JOIN LATERAL unnest(c.search_vector) u
+                WHERE c.id IN ({ids_sql})
+                GROUP BY u.lexeme
+            ) d
+            WHERE t.term = d.lexeme
+            """,
+            ids_params,
+        )
+        cursor.execute("DELETE FROM papers_searchtermstat WHERE doc_freq <= 0")
+        cursor.execute(
+            f"""
+            UPDATE papers_searchcorpusstat s
+            SET chunk_count = GREATEST(s.chunk_count - d.n, 0),
+                total_tokens = GREATEST(s.total_tokens - d.tokens, 0)
+            FROM (
+                SELECT COUNT(*) AS n, COALESCE(SUM(c.token_count), 0) AS tokens
+                FROM papers_paperchunk c WHERE c.id IN ({ids_sql})
+            ) d
+            WHERE s.id = 1
+            """,
+            ids_params,
+        )
+
+
+def delete_chunks(chunk_qs):
+    """Delete chunks and keep the BM25 statistics, the vector store and the chat chunk cache in step."""
+    paper_ids = set(chunk_qs.values_list("paper_id", flat=True).distinct())
+    with transaction.atomic():
+        remove_chunks_from_stats(chunk_qs)
+        vector_store.remove_chunks(chunk_qs)
+        deleted = chunk_qs.delete()
+    chunk_matrix_cache.invalidate_papers(paper_ids)
+    return deleted
+
+
+def rebuild_stats():
+    """Recompute all statistics from scratch (repairs any drift)."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"UPDATE papers_paperchunk c SET token_count = {_TOKEN_COUNT_SQL}")
+        cursor.execute("DELETE FROM papers_searchtermstat")
+        cursor.execute("DELETE FROM papers_searchcorpusstat")
+        cursor.execute(
+            """
+            INSERT INTO papers_searchtermstat (term, doc_freq)
+            SELECT u.lexeme, COUNT(*)
+            FROM papers_paperchunk c CROSS JOIN LATERAL unnest(c.search_vector) u
+            GROUP BY u.lexeme
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO papers_searchcorpusstat (id, chunk_count, total_tokens)
+            SELECT 1, COUNT(*), COALESCE(SUM(token_count), 0) FROM papers_paperchunk
+            """
+        )
+    return SearchTermStat.objects.count(), SearchCorpusStat.objects.filter(pk=1).first()
+
+
+def _prefix_patterns(query_text):
+    patterns = []
+    for word in (query_text or "").split():
+        if word.endswith('*'):
+            stem = word.rstrip('*').strip('"\'').lower()
+            stem = stem.replace('\\', '').replace('%', '').replace('_', '')
+            if stem:
+                patterns.append(stem + '%')
+    return patterns
+
+
+def bm25_sql(search_query, query_text, candidate_qs=None, limit=None, k1=None, b=None):
+    """
+    Build the BM25 ranking statement. Returns (sql, params) for a query that
+    yields `(chunk_id, bm25)` rows best-first, so it can also be embedded as a
+    CTE. Candidates are the chunks matching `search_query` (GIN index),
+    optionally narrowed by `candidate_qs`.
+    """
+    search_settings = get_search_settings()
+    if k1 is None:
+        k1 = search_settings.bm25_k1
+    if b is None:
+        b = search_settings.bm25_b
+
+    match_qs = (candidate_qs if candidate_qs is not None else PaperChunk.objects.all())
+    match_sql, match_params = _ids_sql(match_qs.filter(search_vector=search_query))
+
+    sql = f"""
+        WITH corpus AS (
+            SELECT GREATEST(COALESCE(s.chunk_count, 0), 1)::float AS n,
+                   GREATEST(COALESCE(s.total_tokens::float / NULLIF(s.chunk_count, 0), 1), 1) AS avgdl
+            FROM (SELECT 1) one LEFT JOIN papers_searchcorpusstat s ON s.id = 1
+        ),
+        terms AS (
+            SELECT t.term, ln(1 + (corpus.n - t.doc_freq + 0.5) / (t.doc_freq + 0.5)) AS idf
+            FROM papers_searchtermstat t, corpus
+            WHERE t.term IN (SELECT lexeme FROM unnest(to_tsvector(%s::regconfig, %s)))
+               OR t.term LIKE ANY(%s::text[])
+        )
+        SELECT c.id AS chunk_id,
+               SUM(terms.idf * (tf.n * (%s + 1)) /
+                   (tf.n + %s * (1 - %s + %s * c.token_count / corpus.avgdl))) AS bm25
+        FROM papers_paperchunk c
+        CROSS JOIN corpus
+        CROSS JOIN LATERAL (
+            SELECT u.lexeme, COALESCE(array_length(u.positions, 1), 1) AS n
+            FROM unnest(c.search_vector) u
+        ) tf
+        JOIN terms ON terms.term = tf.lexeme
+        WHERE c.id IN ({match_sql})
+        GROUP BY c.id
+        ORDER BY bm25 DESC
+    """
+    params = [FTS_CONFIG, query_text or "", _prefix_patterns(query_text), k1, k1, b, b] + match_params
+    if limit:
+        sql += " LIMIT %s"
+        params.append(int(limit))
+    return sql, params
+
+
+def bm25_rank(search_query, query_text, candidate_qs=None, limit=None):
+    """Return [(chunk_id, bm25_score), ...] best-first."""
+    if search_query is None:
+        return []
+    sql, params = bm25_sql(search_query, query_text, candidate_qs=candidate_qs, limit=limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
@@ -0,0 +1,147 @@
+# utils/cache_warmup.py
+# Replays popular and curated library searches so the first users after a
+# deploy, cache flush or reindex don't pay the full embedding + DB cost.
+#
+# Sources, in order: SearchSettings.warmup_queries (one per line), then the
+# SearchSettings.warmup_query_count most frequent queries in SearchQueryStat
+# (recorded by paper_list_partial). Each query fills the query-embedding
+# cache and the final search result (keyword hits plus the semantic tail,
+# exactly what paper_list_stream would cache); the facet counts are loaded
+# once.
+#
+# The default cache is per-process locmem, so warm-up has to run inside each
+# web worker: gunicorn's post_worker_init calls `start()`, which warms in a
+# background thread and lets Paper signals schedule another (debounced) pass
+# after the index changes. `python manage.py warm_search_cache` runs the
+# same pass in its own process (useful with a shared cache backend).
+
+import threading
+import time
+
+from django.db import connection
+
+from staff.utils import get_search_settings
+from utils.search_cache import normalize_query
+
+# Seconds without further index changes before re-warming
+REINDEX_WARMUP_DELAY = 30
+MAX_LOGGED_QUERY_LENGTH = 200
+
+_enabled = False
+_timer = None
+_timer_lock = threading.Lock()
+_run_lock = threading.Lock()
+
+
+def record_query(query):
+    """Count one library search (single upsert)."""
+    query = normalize_query(query)
+    if not query or len(query) > MAX_LOGGED_QUERY_LENGTH:
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO papers_searchquerystat (query, count, last_searched_at)
+                VALUES (%s, 1, NOW())
+                ON CONFLICT (query) DO UPDATE
+                SET count = papers_searchquerystat.count + 1, last_searched_at = NOW()
+                """,
+                [query],
+            )
+    except Exception as e:
+        # Never fail a search because the log could not be written
+        print(f"[Warmup] Could not record query: {e}")
+
+
+def warmup_queries(limit=None):
+    """Curated queries first, then the most frequent logged ones (deduplicated)."""
+    from papers.models import SearchQueryStat
+
+    search_settings = get_search_settings()
+    if limit is None:
+        limit = search_settings.warmup_query_count
+
+    queries = []
+    for line in (search_settings.warmup_queries or "").splitlines():
+        query = normalize_query(line)
+        if query and query not in queries:
+            queries.append(query)
+    if limit:
+        for query in SearchQueryStat.objects.order_by("-count").values_list("query", flat=True)[:limit]:
+            if query not in queries:
+                queries.append(query)
+    return queries
+
+
+def warm_search_caches(queries=None):
+    """
+    Run each query through the merged keyword + semantic search path.
+    Returns {"queries": n, "failed": n, "ms": elapsed}.
+    """
+    from papers.views.partial_views import _merged_hits
+    from utils.search_cache import get_cached_results
+    from utils.query_parser import merge_filters, parse_query
+    from utils.facets import get_facet_counts
+    from utils.semantic_search import embed_query
+
+    if queries is None:
+        queries = warmup_queries()
+
+    started = time.perf_counter()
+    failed = 0
+    with _run_lock:
+        try:
+            get_facet_counts()
+        except Exception as e:
+            print(f"[Warmup] Facet counts failed: {e}")
+        for query in queries:
+            parsed = parse_query(query)
+            text, filters = parsed["text"], merge_filters(parsed["filters"])
+            if not text:
+                continue
+            try:
+                if get_cached_results(text, filters) is not None:
+                    continue
+                # Never cache keyword-only hits under the final key: a page
+                # with room would then skip the semantic stream
+                embed_query(text)
+                _merged_hits(text, filters)
+            except Exception as e:
+                failed += 1
+                print(f"[Warmup] {query!r} failed: {e}")
+
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"[Warmup] Warmed {len(queries) - failed}/{len(queries)} queries in {elapsed:.0f} ms")
+    return {"queries": len(queries), "failed": failed, "ms": round(elapsed)}
+
+
+def _run_in_background():
+    def run():
+        try:
+            warm_search_caches()
+        finally:
+            # Threads don't share the request cycle's connection cleanup
+            connection.close()
+
+    threading.Thread(target=run, name="search-warmup", daemon=True).start()
+
+
+def start():
+    """Warm this worker now and re-warm it after later index changes."""
+    global _enabled
+    _enabled = True
+    _run_in_background()
+
+
+def schedule_after_reindex():
+    """Signal hook: re-warm once the index has been quiet for a while."""
+    global _timer
+    if not _enabled:
+        return
+    with _timer_lock:
+        if _timer is not None:
+            _timer.cancel()
+        _timer = threading.Timer(REINDEX_WARMUP_DELAY, _run_in_background)
+        _timer.daemon = True
+        _timer.start()
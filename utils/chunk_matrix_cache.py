@@ -0,0 +1,186 @@
+# utils/chunk_matrix_cache.py
+# Per-process LRU cache of the chunks of papers being chatted about, for
+# single-paper RAG (utils/single_paper_rag.py).
+#
+# An entry holds one paper's chunk embeddings as an L2-normalized float32
+# matrix, with the chunk ids, pages and ordinals (chunk_id) as arrays and all
+# chunk texts in one string plus offsets. The first question about a paper
+# loads it in one query; follow-up questions rank its chunks with one
+# matrix-vector product and expand context from the same arrays. pgvector is
+# not involved: a paper_id filter defeats the HNSW index anyway, so every
+# turn used to scan and deserialize the paper's vectors.
+#
+# Entries are evicted least recently used first once their total size passes
+# CHUNK_MATRIX_CACHE_BYTES. index_paper, delete_chunks and Paper deletes drop
+# the paper's entry in this process; other workers notice the change through
+# a count/max(id) fingerprint checked on every lookup (one index-only query).
+
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+CHUNK_MATRIX_CACHE_BYTES = 128 * 1024 * 1024
+DIMENSIONS = 768
+
+
+class PaperChunkMatrix:
+    """One paper's chunks as arrays; row order is (page, chunk_id)."""
+
+    def __init__(self, paper_id, rows):
+        # rows: [(id, page, chunk_id, text, embedding), ...]
+        self.paper_id = paper_id
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.pages = np.array([row[1] or 0 for row in rows], dtype=np.int32)
+        self.ordinals = np.array([row[2] for row in rows], dtype=np.int32)
+
+        texts = [row[3] or "" for row in rows]
+        self.offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in texts], out=self.offsets[1:])
+        self.text = "".join(texts)
+
+        if rows:
+            matrix = np.vstack([np.asarray(row[4], dtype=np.float32) for row in rows])
+        else:
+            matrix = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+
+        self.fingerprint = (len(rows), int(self.ids.max()) if rows else None)
+        self.nbytes = (
+            self.matrix.nbytes + self.ids.nbytes + self.pages.nbytes
+            + self.ordinals.nbytes + self.offsets.nbytes + sys.getsizeof(self.text)
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def chunk(self, row):
+        """Unsaved PaperChunk for one row (no embedding loaded)."""
+        from papers.models import PaperChunk
+
+        return PaperChunk(
+            id=int(self.ids[row]),
+            paper_id=self.paper_id,
+            page=int(self.pages[row]),
+            chunk_id=int(self.ordinals[row]),
+            text=self.text[self.offsets[row]:self.offsets[row + 1]],
+        )
+
+    def search(self, query_emb, k):
+        """[(PaperChunk, cosine distance), ...] for the k nearest chunks, best-first."""
+        k = min(int(k), len(self))
+        if k <= 0:
+            return []
+        query = np.asarray(query_emb, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        similarities = self.matrix @ query
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return [(self.chunk(row), 1.0 - float(similarities[row])) for row in top]
+
+    def expand(self, hits, window=1):
+        """Same windows as single_paper_rag.expand_context, without a query."""
+        if not hits or not len(self):
+            return list(hits)
+        mask = np.isin(self.ids, [chunk.id for chunk in hits])
+        for chunk in hits:
+            if chunk.page:
+                mask |= (self.pages >= max(1, chunk.page - window)) & (self.pages <= chunk.page + window)
+            else:
+                mask |= (self.ordinals >= chunk.chunk_id - window) & (self.ordinals <= chunk.chunk_id + window)
+        return [self.chunk(row) for row in np.flatnonzero(mask)]
+
+
+def _fingerprint(paper_id):
+    from django.db.models import Count, Max
+    from papers.models import PaperChunk
+
+    stats = PaperChunk.objects.filter(paper_id=paper_id).aggregate(n=Count("id"), last=Max("id"))
+    return (stats["n"], stats["last"])
+
+
+def _load(paper_id):
+    from papers.models import PaperChunk
+
+    rows = list(
+        PaperChunk.objects
+        .filter(paper_id=paper_id)
+        .order_by("page", "chunk_id")
+        .values_list("id", "page", "chunk_id", "text", "embedding")
+    )
+    return PaperChunkMatrix(paper_id, rows)
+
+
+class ChunkMatrixCache:
+    def __init__(self, max_bytes=CHUNK_MATRIX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()   # paper_id -> PaperChunkMatrix, oldest first
+        self._oversized = {}            # paper_id -> fingerprint of papers too big to cache
+        self._lock = threading.Lock()
+
+    def get(self, paper_id):
+        """
+        The paper's chunk matrix, loaded (and cached) when missing or stale.
+        None for a paper known to be larger than the whole cache; callers
+        query the database instead.
+        """
+        fingerprint = _fingerprint(paper_id)
+        with self._lock:
+            entry = self._entries.get(paper_id)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self._entries.move_to_end(paper_id)
+                return entry
+            if self._oversized.get(paper_id) == fingerprint:
+                return None
+
+        entry = _load(paper_id)
+        with self._lock:
+            self._discard(paper_id)
+            if entry.nbytes > self.max_bytes:
+                self._oversized[paper_id] = entry.fingerprint
+            else:
+                self._entries[paper_id] = entry
+                self.nbytes += entry.nbytes
+                while self.nbytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.nbytes -= evicted.nbytes
+        return entry
+
+    def _discard(self, paper_id):
+        self._oversized.pop(paper_id, None)
+        entry = self._entries.pop(paper_id, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+
+    def invalidate(self, paper_ids):
+        with self._lock:
+            for paper_id in paper_ids:
+                self._discard(paper_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._oversized.clear()
+            self.nbytes = 0
+
+
+_cache = ChunkMatrixCache()
+
+
+def get_paper_chunks(paper_id):
+    return _cache.get(paper_id)
+
+
+def invalidate_paper(paper_id):
+    """Reindex hook: drop the paper's matrix in this process."""
+    _cache.invalidate([paper_id])
+
+
+def invalidate_papers(paper_ids):
+    _cache.invalidate([pid for pid in paper_ids if pid is not None])
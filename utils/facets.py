@@ -0,0 +1,123 @@
+# utils/facets.py
+# Paper counts per facet value, stored in FacetCount and kept current by the
+# Paper signals, so filter sidebars and insights charts read one small table
+# instead of loading every paper.
+#
+# Facets: tag, college, program, year, author, plus the pairs year_tag
+# ("2023|machine learning") and college_program ("ccs|bsit"). Each paper
+# counts once per distinct value.
+
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from utils.search_cache import get_index_generation
+
+FACET_FIELDS = ("tags", "college", "program", "year", "authors")
+# Reading FacetCount is one small query; the cache only absorbs bursts
+FACET_CACHE_TIMEOUT = 30
+PAIR_SEPARATOR = "|"
+
+
+def paper_facets(tags, college, program, year, authors):
+    """Counter of (facet, value) for one paper's field values."""
+    facets = Counter()
+    tag_names = {t for t in (tags or []) if isinstance(t, str) and t}
+    for tag in tag_names:
+        facets[("tag", tag)] = 1
+    if college:
+        facets[("college", college)] = 1
+    if program:
+        facets[("program", program)] = 1
+    if college and program:
+        facets[("college_program", f"{college}{PAIR_SEPARATOR}{program}")] = 1
+    if year:
+        facets[("year", str(year))] = 1
+        for tag in tag_names:
+            facets[("year_tag", f"{year}{PAIR_SEPARATOR}{tag}")] = 1
+    for name in {a.strip() for a in (authors or []) if isinstance(a, str) and a.strip()}:
+        facets[("author", name)] = 1
+    return facets
+
+
+def facets_of(paper):
+    return paper_facets(paper.tags, paper.college, paper.program, paper.year, paper.authors)
+
+
+def apply_delta(delta):
+    """Add {(facet, value): +/-n} to the stored counts in one statement."""
+    rows = [(facet, value, n) for (facet, value), n in delta.items() if n]
+    if not rows:
+        return
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(rows))
+    params = [x for row in rows for x in row]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO papers_facetcount (facet, value, count) VALUES {placeholders}
+            ON CONFLICT (facet, value) DO UPDATE
+            SET count = papers_facetcount.count + EXCLUDED.count
+            """,
+            params,
+        )
+        if any(n < 0 for _, _, n in rows):
+            cursor.execute("DELETE FROM papers_facetcount WHERE count <= 0")
+
+
+def diff(old, new):
+    delta = Counter(new)
+    delta.subtract(old)
+    return delta
+
+
+def rebuild_facet_counts():
+    """Recompute every count from the papers table (after bulk edits)."""
+    from papers.models import FacetCount, Paper
+
+    counts = Counter()
+    rows = Paper.objects.values_list(*FACET_FIELDS)
+    for tags, college, program, year, authors in rows.iterator():
+        counts.update(paper_facets(tags, college, program, year, authors))
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(
+            [FacetCount(facet=f, value=v, count=n) for (f, v), n in counts.items()],
+            batch_size=1000,
+        )
+    return len(counts)
+
+
+def _split_pair(value):
+    first, _, second = value.partition(PAIR_SEPARATOR)
+    return first, second
+
+
+def get_facet_counts():
+    """
+    {facet: {value: count}} for all facets, best-first by count. Years are
+    ints; year_tag keys are (year, tag) and college_program keys are
+    (college, program). One read of FacetCount, cached briefly per index
+    generation (shared by all workers, bumped when facet fields change).
+    """
+    key = f"facet_counts:g{get_index_generation()}"
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    from papers.models import FacetCount
+
+    facets = {name: {} for name in ("tag", "college", "program", "year", "author", "year_tag", "college_program")}
+    rows = FacetCount.objects.filter(count__gt=0).order_by("-count", "value").values_list("facet", "value", "count")
+    for facet, value, count in rows:
+        if facet == "year":
+            value = int(value)
+        elif facet == "year_tag":
+            year, tag = _split_pair(value)
+            value = (int(year), tag)
+        elif facet == "college_program":
+            value = _split_pair(value)
+        facets.setdefault(facet, {})[value] = count
+
+    cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,169 @@
+# utils/fuzzy.py
+# Typo-tolerant tier between keyword and semantic search. Paper titles,
+# author names and tag names are matched with pg_trgm word similarity
+# (GIN trigram indexes, no embedding call), and "did you mean" corrections
+# come from the bank_of_words.json vocabulary. Only words the corpus has never
+# seen are corrected, and only to words it has.
+
+import difflib
+import json
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast, Greatest
+
+from papers.models import Paper, Tag
+from staff.utils import get_search_settings
+from utils.bm25 import FTS_CONFIG
+from utils.snippets import make_snippet, query_terms
+
+VOCABULARY_FILE = "bank_of_words.json"
+# difflib ratio needed before a vocabulary word is suggested
+CORRECTION_CUTOFF = 0.8
+MIN_CORRECTABLE_LENGTH = 4
+
+
+@lru_cache(maxsize=1)
+def load_vocabulary():
+    """Lowercase words from the tag names and descriptions in bank_of_words.json."""
+    path = os.path.join(settings.BASE_DIR, VOCABULARY_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Fuzzy] Could not load {path}: {e}")
+        return frozenset()
+
+    words = set()
+    for entry in entries:
+        text = f"{entry.get('name', '')} {entry.get('description', '')}"
+        words.update(w for w in re.findall(r"[a-z]+", text.lower()) if len(w) >= 3)
+    return frozenset(words)
+
+
+def corpus_words(words):
+    """
+    The subset of `words` the corpus knows: its stemmed lexeme is a BM25 term
+    (SearchTermStat), it is a stop word, or it appears literally in a paper
+    title or author list (trigram-indexed ILIKE). One query.
+    """
+    words = sorted(set(words))
+    if not words:
+        return set()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT w FROM unnest(%s::text[]) AS w
+            WHERE length(to_tsvector(%s::regconfig, w)) = 0
+               OR EXISTS (
+                    SELECT 1 FROM papers_searchtermstat t
+                    WHERE t.term IN (SELECT lexeme FROM unnest(to_tsvector(%s::regconfig, w)))
+               )
+               OR EXISTS (
+                    SELECT 1 FROM papers_paper p
+                    WHERE p.title ILIKE '%%' || w || '%%'
+                       OR p.authors::text ILIKE '%%' || w || '%%'
+               )
+            """,
+            [words, FTS_CONFIG, FTS_CONFIG],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def did_you_mean(query):
+    """
+    Return the query with unknown words replaced by their closest vocabulary
+    word, or None when nothing was corrected. A word is only corrected when
+    it matches nothing in the corpus, and only to a word that does.
+    """
+    vocabulary = load_vocabulary()
+    if not query or not vocabulary:
+        return None
+
+    candidates = {}
+    for word in re.findall(r"[A-Za-z]+", query):
+        lower = word.lower()
+        if len(lower) < MIN_CORRECTABLE_LENGTH or lower in vocabulary or lower in candidates:
+            continue
+        close = difflib.get_close_matches(lower, vocabulary, n=3, cutoff=CORRECTION_CUTOFF)
+        if close:
+            candidates[lower] = close
+    if not candidates:
+        return None
+
+    known = corpus_words(list(candidates) + [w for close in candidates.values() for w in close])
+    corrections = {}
+    for lower, close in candidates.items():
+        if lower in known:
+            continue
+        replacement = next((w for w in close if w in known), None)
+        if replacement:
+            corrections[lower] = replacement
+    if not corrections:
+        return None
+    return re.sub(r"[A-Za-z]+", lambda m: corrections.get(m.group(0).lower(), m.group(0)), query)
+
+
+def fuzzy_search(query, top_k=None, filters=None):
+    """
+    Trigram match of the query against paper titles, author names and tag
+    names. Returns result dicts shaped like keyword_search, best-first, each
+    with the query's `did_you_mean` correction (or None).
+    """
+    from utils.semantic_search import filter_papers
+
+    query = (query or "").strip()
+    if len(query) < 3:
+        return []
+    if top_k is None:
+        top_k = get_search_settings().top_k_results
+
+    tag_names = list(
+        Tag.objects.filter(is_active=True, name__trigram_word_similar=query)
+        .values_list("name", flat=True)[:10]
+    )
+
+    match = Q(title__trigram_word_similar=query) | Q(authors_text__trigram_word_similar=query)
+    if tag_names:
+        # Any of the matched tags; jsonb ?| on the tags GIN index
+        match |= Q(tags__has_any_keys=tag_names)
+
+    papers = (
+        Paper.objects.annotate(authors_text=Cast("authors", TextField()))
+        .filter(match)
+        .annotate(score=Greatest(
+            TrigramWordSimilarity(query, "title"),
+            TrigramWordSimilarity(query, "authors_text"),
+        ))
+        .only("id", "title", "authors", "abstract")
+        .order_by("-score")
+    )
+    paper_qs = filter_papers(filters)
+    if paper_qs is not None:
+        papers = papers.filter(id__in=paper_qs.values("id"))
+
+    papers = list(papers[:top_k])
+    if not papers:
+        return []
+    # Shown by the list as "did you mean"; carried on each hit so the view
+    # does not correct the same query twice
+    suggestion = did_you_mean(query)
+    highlight = " ".join(query_terms(suggestion or query))
+    results = []
+    for paper in papers:
+        results.append({
+            "paper_id": paper.id,
+            "title": paper.title,
+            "authors": paper.authors,
+            "page": None,
+            "text": make_snippet(paper.abstract, highlight),
+            "score": round(float(paper.score or 0), 4),
+            "match_type": "fuzzy",
+            "did_you_mean": suggestion,
+        })
+    return results
@@ -0,0 +1,97 @@
+# utils/query_parser.py
+# Splits a library search box query into structured filters and free text.
+#
+#   author:Santos year:2023 "inventory system" tag:"machine learning" barcode
+#
+# -> filters {"author": ["Santos"], "year": "2023", "tags": ["machine learning"],
+#             "phrases": ["inventory system"]}
+#    text    '"inventory system" barcode'
+#
+# Operator values may be quoted. Quoted phrases stay in the text (so BM25
+# scores them as phrases) and are also returned as required phrases.
+
+import re
+
+OPERATORS = ("author", "year", "tag", "college", "program")
+
+_TOKEN_RE = re.compile(
+    r'(?P<op>\b(?:' + "|".join(OPERATORS) + r'):)(?:"(?P<qval>[^"]*)"|(?P<val>\S+))'
+    r'|"(?P<phrase>[^"]+)"',
+    re.IGNORECASE,
+)
+_YEAR_RE = re.compile(r"^(\d{4})(?:(?:-|\.\.)(\d{4}))?$")
+
+
+def parse_query(query):
+    """
+    Return {"text": free text, "filters": {...}}. Filter keys match
+    `utils.semantic_search.filter_papers`: author (list), year ("2023" or
+    "2019-2023"), tags (list), college, program, phrases (list).
+    """
+    query = query or ""
+    filters = {}
+    text_parts = []
+    pos = 0
+
+    for m in _TOKEN_RE.finditer(query):
+        text_parts.append(query[pos:m.start()])
+        pos = m.end()
+
+        if m.group("phrase") is not None:
+            phrase = m.group("phrase").strip()
+            if phrase:
+                filters.setdefault("phrases", []).append(phrase)
+                text_parts.append(f'"{phrase}"')
+            continue
+
+        op = m.group("op")[:-1].lower()
+        value = (m.group("qval") if m.group("qval") is not None else m.group("val")).strip()
+        if not value:
+            continue
+        if op == "author":
+            filters.setdefault("author", []).append(value)
+        elif op == "tag":
+            filters.setdefault("tags", []).append(value)
+        elif op == "year":
+            if _YEAR_RE.match(value):
+                filters["year"] = value
+            else:
+                # Not a year: keep it as ordinary search text
+                text_parts.append(value)
+        else:
+            filters[op] = value.lower()
+
+    text_parts.append(query[pos:])
+    text = re.sub(r"\s+", " ", " ".join(text_parts)).strip()
+    return {"text": text, "filters": filters}
+
+
+def year_range(value):
+    """'2023' -> (2023, 2023); '2019-2023' -> (2019, 2023); invalid -> None."""
+    m = _YEAR_RE.match(str(value or "").strip())
+    if not m:
+        return None
+    start = int(m.group(1))
+    end = int(m.group(2) or start)
+    return (min(start, end), max(start, end))
+
+
+def merge_filters(*filter_dicts):
+    """
+    Combine filter dicts (e.g. GET parameters and parsed operators). List
+    values are concatenated without duplicates; scalar values from later
+    dicts win.
+    """
+    merged = {}
+    for filters in filter_dicts:
+        for key, value in (filters or {}).items():
+            if value in (None, "", []):
+                continue
+            if isinstance(value, (list, tuple)):
+                current = merged.get(key) or []
+                if not isinstance(current, list):
+                    current = [current]
+                merged[key] = current + [v for v in value if v not in current]
+            else:
+                merged[key] = value
+    return merged
@@ -0,0 +1,145 @@
+# utils/rerank.py
+# Optional second-stage reranking with a small local cross-encoder (CPU).
+#
+# semantic_search and query_rag hand over their first-stage candidates; the
+# top SearchSettings.rerank_top_n are scored in batches as (query, text)
+# pairs until SearchSettings.rerank_budget_ms is spent. Scored candidates are
+# reordered among themselves, everything else keeps its first-stage order.
+# If the model is not loaded yet, sentence-transformers is missing, or the
+# first batch would not fit the budget, the first-stage order is returned.
+#
+# The model loads in a background thread on first use (or at worker start),
+# so a cold worker never blocks a request on the download/load. Loading ends
+# by timing a full calibration batch, so the per-pair cost is known before
+# any request is reranked and the first batch is budgeted like the rest.
+#
+# sentence-transformers (and torch) is an optional dependency; it is not in
+# requirements.txt. Install it where rerank_enabled is turned on.
+
+import threading
+import time
+
+from staff.utils import get_search_settings
+
+RERANK_BATCH_SIZE = 8
+# Cross-encoders are trained on passages; longer texts only cost time
+RERANK_MAX_CHARS = 1500
+
+_model = None
+_model_name = None
+_load_lock = threading.Lock()
+_loading = False
+_failed = set()   # model names that could not be loaded; not retried
+# Moving estimate of seconds per scored pair, used to avoid starting a
+# batch that would overrun the budget
+_seconds_per_pair = None
+
+
+def _load(model_name):
+    global _model, _model_name, _loading
+    try:
+        from sentence_transformers import CrossEncoder
+
+        started = time.perf_counter()
+        model = CrossEncoder(model_name, device="cpu", max_length=256)
+        model.predict([("warm up", "warm up")])
+        _calibrate(model)
+        _model, _model_name = model, model_name
+        print(f"[Rerank] Loaded {model_name} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    except Exception as e:
+        print(f"[Rerank] Could not load cross-encoder {model_name}: {e}")
+        _failed.add(model_name)
+    finally:
+        _loading = False
+
+
+def _calibrate(model):
+    """Seed the per-pair cost with one full batch of maximum-length pairs."""
+    global _seconds_per_pair
+    passage = ("calibration passage " * RERANK_MAX_CHARS)[:RERANK_MAX_CHARS]
+    pairs = [("calibration query", passage)] * RERANK_BATCH_SIZE
+    started = time.perf_counter()
+    model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+    _seconds_per_pair = (time.perf_counter() - started) / len(pairs)
+
+
+def get_model(model_name, wait=False):
+    """
+    The loaded CrossEncoder for `model_name`, or None while it is loading.
+    `wait=True` loads synchronously (worker warm-up, management commands).
+    """
+    global _loading
+    if _model is not None and _model_name == model_name:
+        return _model
+    with _load_lock:
+        if _model is not None and _model_name == model_name:
+            return _model
+        if _loading or model_name in _failed:
+            return None
+        _loading = True
+    if wait:
+        _load(model_name)
+        return _model if _model_name == model_name else None
+    threading.Thread(target=_load, args=(model_name,), daemon=True).start()
+    return None
+
+
+def is_enabled(search_settings=None):
+    search_settings = search_settings or get_search_settings()
+    return search_settings.rerank_enabled and search_settings.rerank_top_n > 0
+
+
+def warm_up():
+    search_settings = get_search_settings()
+    if is_enabled(search_settings):
+        get_model(search_settings.rerank_model_name, wait=True)
+
+
+def rerank(query, items, text_of, top_n=None, budget_ms=None):
+    """
+    Reorder `items` (best-first) by cross-encoder relevance to `query`.
+    `text_of(item)` returns the passage to score. Returns a new list; when
+    reranking is disabled or unavailable it is `items` in the same order.
+    """
+    global _seconds_per_pair
+    items = list(items)
+    search_settings = get_search_settings()
+    if not query or len(items) < 2 or not is_enabled(search_settings):
+        return items
+
+    model = get_model(search_settings.rerank_model_name)
+    if model is None or _seconds_per_pair is None:
+        return items
+
+    top_n = min(top_n or search_settings.rerank_top_n, len(items))
+    budget = (budget_ms if budget_ms is not None else search_settings.rerank_budget_ms) / 1000.0
+    deadline = time.perf_counter() + budget
+
+    head = items[:top_n]
+    scores = []
+    for start in range(0, top_n, RERANK_BATCH_SIZE):
+        batch = head[start:start + RERANK_BATCH_SIZE]
+        now = time.perf_counter()
+        if now + _seconds_per_pair * len(batch) > deadline:
+            break
+        pairs = [(query, (text_of(item) or "")[:RERANK_MAX_CHARS]) for item in batch]
+        try:
+            batch_scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        except Exception as e:
+            print(f"[Rerank] Scoring failed, keeping first-stage order: {e}")
+            return items
+        elapsed = time.perf_counter() - now
+        per_pair = elapsed / len(batch)
+        _seconds_per_pair = 0.8 * _seconds_per_pair + 0.2 * per_pair
+        scores.extend(float(s) for s in batch_scores)
+        if time.perf_counter() > deadline:
+            break
+
+    if len(scores) < 2:
+        return items
+    if len(scores) < top_n:
+        print(f"[Rerank] Budget spent after {len(scores)}/{top_n} candidates")
+
+    # Stable: ties keep first-stage order
+    scored = sorted(range(len(scores)), key=lambda i: -scores[i])
+    return [head[i] for i in scored] + items[len(scores):]
@@ -0,0 +1,131 @@
+# utils/search_cache.py
+# Result cache for library search. Keys combine the normalized query, the
+# active filters, the SearchSettings version and an index generation counter
+# that is bumped whenever chunks or searchable paper fields change, so stale
+# entries are never read again and simply expire.
+#
+# The generation is a Postgres sequence, not a cache key: the default cache
+# is per-process locmem, and a bump in the worker that indexed a paper has to
+# reach every other worker. Sequences are not rolled back, so a generation is
+# never reused. Each process re-reads it at most every INDEX_GENERATION_TTL
+# seconds.
+
+import hashlib
+import json
+import re
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from staff.utils import get_search_settings
+
+INDEX_GENERATION_SEQUENCE = 'papers_search_index_generation_seq'
+INDEX_GENERATION_TTL = 2
+SEARCH_CACHE_PREFIX = 'search_results'
+EMBEDDING_CACHE_PREFIX = 'query_embedding'
+# Query embeddings only depend on the text and the model, not on the index
+EMBEDDING_CACHE_TIMEOUT = 24 * 3600
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so equivalent queries share a key."""
+    return re.sub(r'\s+', ' ', (query or '').strip().lower())
+
+
+_generation = None
+_generation_read_at = 0.0
+_generation_lock = threading.Lock()
+
+
+def _remember_generation(generation):
+    global _generation, _generation_read_at
+    with _generation_lock:
+        _generation, _generation_read_at = generation, time.monotonic()
+    return generation
+
+
+def get_index_generation():
+    if _generation is not None and time.monotonic() - _generation_read_at < INDEX_GENERATION_TTL:
+        return _generation
+    with connection.cursor() as cursor:
+        # A fresh sequence reports last_value 1 before the first nextval()
+        # also returns 1; read it as 0 so that first bump changes the key
+        cursor.execute(
+            f"SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {INDEX_GENERATION_SEQUENCE}"
+        )
+        generation = cursor.fetchone()[0]
+    return _remember_generation(generation)
+
+
+def _next_generation():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s)", [INDEX_GENERATION_SEQUENCE])
+        generation = cursor.fetchone()[0]
+    print(f"[SearchCache] Index generation -> {generation}")
+    return _remember_generation(generation)
+
+
+def bump_index_generation():
+    """Invalidate every cached search result in all workers (call after chunks change)."""
+    generation = _next_generation()
+    if connection.in_atomic_block:
+        # Other workers may cache results from the pre-commit state under
+        # this generation; move on once the change is visible
+        transaction.on_commit(_next_generation)
+    return generation
+
+
+def make_search_cache_key(query, filters=None, stage=None):
+    search_settings = get_search_settings()
+    payload = json.dumps(
+        {
+            "q": normalize_query(query),
+            "filters": _normalize_filters(filters or {}),
+        },
+        sort_keys=True,
+    )
+    digest = hashlib.md5(payload.encode('utf-8')).hexdigest()
+    key = (
+        f"{SEARCH_CACHE_PREFIX}:v{search_settings.version}"
+        f":g{get_index_generation()}:{digest}"
+    )
+    # Partial result sets (e.g. keyword hits awaiting the semantic stream)
+    return f"{key}:{stage}" if stage else key
+
+
+def get_cached_results(query, filters=None, stage=None):
+    return cache.get(make_search_cache_key(query, filters, stage))
+
+
+def set_cached_results(query, filters, results, stage=None):
+    timeout = get_search_settings().search_cache_timeout
+    if not timeout:
+        return
+    cache.set(make_search_cache_key(query, filters, stage), results, timeout)
+
+
+def _normalize_filters(filters):
+    normalized = {}
+    for key, value in filters.items():
+        if value in (None, '', []):
+            continue
+        if isinstance(value, (list, tuple)):
+            value = sorted(str(v) for v in value)
+        else:
+            value = str(value)
+        normalized[key] = value
+    return normalized
+
+
+def _embedding_cache_key(query, model_name):
+    digest = hashlib.md5(normalize_query(query).encode('utf-8')).hexdigest()
+    return f"{EMBEDDING_CACHE_PREFIX}:{model_name}:{digest}"
+
+
+def get_cached_embedding(query, model_name):
+    return cache.get(_embedding_cache_key(query, model_name))
+
+
+def set_cached_embedding(query, model_name, embedding):
+    cache.set(_embedding_cache_key(query, model_name), embedding, EMBEDDING_CACHE_TIMEOUT)
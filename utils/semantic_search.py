@@ -1,11 +1,22 @@
 import re
 import os
+import threading
 import fitz 
 import numpy as np
 from papers.models import Paper, PaperChunk
-from django.db.models import Func, FloatField, Value
+from django.db import connection, transaction, DatabaseError
+from django.db.models import Exists, Func, FloatField, OuterRef, Value, Q, TextField
+from django.db.models.functions import Cast
 from pgvector.django import CosineDistance
 from utils.html_chunker import process_html_to_chunks
+from utils.upload_staging import extract_pdf_pages
+from utils.search_cache import bump_index_generation, get_cached_embedding, set_cached_embedding
+from utils.bm25 import FTS_CONFIG, add_chunks_to_stats, bm25_rank, bm25_sql
+from utils.snippets import make_snippet
+from utils import chunk_matrix_cache, vector_store
+from utils.query_parser import year_range
+from utils.rerank import rerank
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from django.conf import settings
 from staff.utils import get_search_settings 
 from google import genai
@@ -137,10 +148,11 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 import fitz
 import re
 
-def extract_and_chunk(pdf_path, chunk_size=None, chunk_overlap=None):
+def extract_and_chunk(pdf_path, chunk_size=None, chunk_overlap=None, pages=None):
   """
   Extracts text from PDF and chunks recursively, ignoring appendices after configurable chars.
-  (Function remains the same)
+  If `pages` (per-page text already extracted during the upload preview) is
+  given, the PDF is not opened again.
   """
   # ✅ Get configurable settings
   search_settings = get_search_settings()
@@ -154,12 +166,15 @@ def extract_and_chunk(pdf_path, chunk_size=None, chunk_overlap=None):
   print(f"  - chunk_overlap: {chunk_overlap}")
   print(f"  - appendix_cutoff: {search_settings.appendix_cutoff}")
 
-  doc = fitz.open(pdf_path)
+  if pages is None:
+    pages = extract_pdf_pages(pdf_path)
+  else:
+    print(f"[CHUNKING] Reusing {len(pages)} pre-extracted pages")
+
   full_text = ""
   page_map = []
   
-  for page_num, page in enumerate(doc, start=1):
-    text = page.get_text("text")
+  for page_num, text in enumerate(pages, start=1):
     
     # ✅ Use configurable appendix cutoff
     if len(full_text) > search_settings.appendix_cutoff:
@@ -170,8 +185,6 @@ def extract_and_chunk(pdf_path, chunk_size=None, chunk_overlap=None):
     full_text += text
     page_map.extend([page_num] * len(text))
   
-  doc.close()
-  
   # Recursive chunking with LangChain
   text_splitter = RecursiveCharacterTextSplitter(
     chunk_size=chunk_size,
@@ -202,10 +215,11 @@ def extract_and_chunk(pdf_path, chunk_size=None, chunk_overlap=None):
 # -------------------------------
 # Indexing (MODIFIED)
 # -------------------------------
-def index_paper(paper: Paper):
+def index_paper(paper: Paper, pages=None):
   """
   Extract, chunk, embed, and save PaperChunks into DB for a Paper.
   Supports both PDF (via PyMuPDF) and CHM (via merged.html).
+  `pages` is the optional per-page text of the PDF from a staged upload.
   """
   # ✅ Get GenAI Client
   client = get_model()
@@ -221,7 +235,7 @@ def index_paper(paper: Paper):
 
   if ext == ".pdf":
     # Normal PDF embedding flow
-    chunks = extract_and_chunk(paper.file.path)
+    chunks = extract_and_chunk(paper.file.path, pages=pages)
 
   elif paper.merged_html:
     # ✅ Make sure merged_html exists and is accessible
@@ -261,20 +275,124 @@ def index_paper(paper: Paper):
       )
     )
 
-  PaperChunk.objects.bulk_create(objs)
+  created = PaperChunk.objects.bulk_create(objs)
+  add_chunks_to_stats(PaperChunk.objects.filter(id__in=[c.id for c in created]))
+  update_paper_centroids([paper.id])
+  vector_store.refresh_paper(paper, created)
+  chunk_matrix_cache.invalidate_paper(paper.id)
+  bump_index_generation()
   paper.is_indexed = True
   paper.save()
   print(f"[+] Indexed {len(chunks)} chunks for {paper.title}")
 
 
+def update_paper_centroids(paper_ids):
+  """
+  Recompute `Paper.centroid_embedding` (mean chunk embedding) for the given
+  papers. Call whenever a paper's chunks are created or deleted; papers left
+  without chunks get a NULL centroid.
+  """
+  paper_ids = [pid for pid in paper_ids if pid is not None]
+  if not paper_ids:
+    return
+  with connection.cursor() as cursor:
+    cursor.execute(
+      """
+      UPDATE papers_paper p
+      SET centroid_embedding = (
+        SELECT AVG(c.embedding) FROM papers_paperchunk c WHERE c.paper_id = p.id
+      )
+      WHERE p.id = ANY(%s)
+      """,
+      [list(paper_ids)],
+    )
+
+
 # -------------------------------
 # Semantic Search (MODIFIED)
 # -------------------------------
 
 
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
+from django.contrib.postgres.search import SearchQuery
+
+_PREFIX_TERM_RE = re.compile(r"[\w']+\*?", re.UNICODE)
+
+
+def build_search_query(query):
+  """
+  Turn a user query into a SearchQuery against PaperChunk.search_vector.
+  - `"exact phrase"`  -> phrase query
+  - `optim*`          -> prefix query (every term ANDed, `*` terms as `term:*`)
+  - anything else     -> websearch syntax (quotes, OR, -exclusion)
+  """
+  query = (query or "").strip()
+  if not query:
+    return None
+
+  if len(query) > 2 and query.startswith('"') and query.endswith('"') and query.count('"') == 2:
+    return SearchQuery(query.strip('"'), search_type='phrase', config=FTS_CONFIG)
+
+  if '*' in query:
+    terms = []
+    for term in _PREFIX_TERM_RE.findall(query):
+      word = term.rstrip('*').replace("'", "")
+      if not word:
+        continue
+      terms.append(f"{word}:*" if term.endswith('*') else word)
+    if terms:
+      return SearchQuery(' & '.join(terms), search_type='raw', config=FTS_CONFIG)
+
+  return SearchQuery(query, search_type='websearch', config=FTS_CONFIG)
+
+
+def filter_papers(filters):
+  """
+  Build a Paper queryset from structured search filters
+  (author, college, program, year, tags, phrases; see utils/query_parser.py).
+  Returns None when no filter applies, so callers can skip the restriction
+  entirely.
+  """
+  if not filters:
+    return None
 
-def semantic_search(query, top_k=None, min_score=None, bm25_weight=None, vector_weight=None):
+  qs = Paper.objects.all()
+  applied = False
+  authors = filters.get("author")
+  if authors:
+    if isinstance(authors, str):
+      authors = [authors]
+    qs = qs.annotate(authors_text=Cast("authors", TextField()))
+    for name in authors:
+      qs = qs.filter(authors_text__icontains=name)
+    applied = True
+  if filters.get("college"):
+    qs = qs.filter(college=filters["college"])
+    applied = True
+  if filters.get("program"):
+    qs = qs.filter(program=filters["program"])
+    applied = True
+  if filters.get("year"):
+    years = year_range(filters["year"])
+    if years:
+      qs = qs.filter(year__range=years)
+      applied = True
+  if filters.get("phrases"):
+    for phrase in filters["phrases"]:
+      qs = qs.filter(Exists(PaperChunk.objects.filter(
+        paper=OuterRef("pk"),
+        search_vector=SearchQuery(phrase, search_type="phrase", config=FTS_CONFIG),
+      )))
+    applied = True
+  if filters.get("tags"):
+    tag_filters = Q()
+    for t in filters["tags"]:
+      tag_filters |= Q(tags__contains=[t])
+    qs = qs.filter(tag_filters)
+    applied = True
+  return qs if applied else None
+
+
+def semantic_search(query, top_k=None, min_score=None, bm25_weight=None, vector_weight=None, filters=None):
   # ✅ Get configurable settings
   search_settings = get_search_settings()
   if top_k is None:
@@ -295,13 +413,254 @@ def semantic_search(query, top_k=None, min_score=None, bm25_weight=None, vector_
   print(f"  - hybrid_search_multiplier: {search_settings.hybrid_search_multiplier}")
   print(f"  - hybrid_search_min_results: {search_settings.hybrid_search_min_results}")
 
-  # ✅ Get GenAI Client
+  # The embedding request is network-bound: send it first and run the
+  # keyword leg and lookups on this thread while it is in flight
+  embedding = _search_executor().submit(embed_query, query)
+
+  search_query = build_search_query(query)
+  
+  # ✅ Use configurable initial limit (per retriever)
+  initial_limit = max(
+    search_settings.hybrid_search_min_results,
+    top_k * search_settings.hybrid_search_multiplier
+  )
+
+  paper_qs = filter_papers(filters)
+  chunk_qs = PaperChunk.objects.filter(paper__in=paper_qs) if paper_qs is not None else None
+  fts_hits = bm25_rank(search_query, query, candidate_qs=chunk_qs, limit=initial_limit)
+  collection = None
+  if paper_qs is None and search_settings.vector_backend == "numpy":
+    collection = vector_store.get_collection("chunks")
+
+  try:
+    query_emb = embedding.result(timeout=EMBEDDING_DEADLINE_SECONDS)
+  except FutureTimeout:
+    print(f"[SEARCH] Embedding missed the {EMBEDDING_DEADLINE_SECONDS}s deadline; keyword results only")
+    query_emb = None
+  if query_emb is None and not fts_hits:
+    return []
+
+  # Title/abstract vectors live on the (much smaller) paper table
+  title_weight = search_settings.title_field_weight
+  abstract_weight = search_settings.abstract_field_weight
+  short_query = len(query.split()) <= TITLE_QUERY_MAX_WORDS
+  shortlist_size = search_settings.paper_shortlist_size
+  field_hits = {}
+  if query_emb is not None and (title_weight or abstract_weight):
+    field_hits = field_candidates(
+      query_emb,
+      max(initial_limit, shortlist_size if short_query else 0),
+      paper_qs=paper_qs,
+      title=bool(title_weight),
+      abstract=bool(abstract_weight),
+    )
+
+  ann_hits = None
+  shortlist_ids = None
+  if collection is not None and query_emb is not None:
+    # Empty when the store has not been built yet -> pgvector fallback
+    ann_hits = collection.search(
+      query_emb, initial_limit, nprobe=search_settings.vector_store_nprobe
+    ) or None
+  if ann_hits is None and short_query and shortlist_size and field_hits:
+    # A short, title-like query: papers whose title/abstract match are the
+    # shortlist for the chunk scan instead of the centroid neighbours
+    shortlist_ids = sorted(field_hits, key=lambda pid: field_hits[pid]["best_rank"])[:shortlist_size]
+
+  candidates = hybrid_candidates(
+    search_query, query, query_emb, initial_limit,
+    paper_qs=paper_qs,
+    shortlist_size=shortlist_size,
+    ann_hits=ann_hits,
+    fts_hits=fts_hits,
+    shortlist_ids=shortlist_ids,
+  )
+  if not candidates and not field_hits:
+    return []
+
+  fused = fuse_candidates(
+    candidates,
+    method=search_settings.fusion_method,
+    bm25_weight=bm25_weight,
+    vector_weight=vector_weight,
+    rrf_k=search_settings.rrf_k,
+  )
+
+  paper_best = {}
+  passages = {}
+  for res, hybrid_score in fused:
+    similarity = 1 - res.distance
+    # Vector-only candidates must still clear the similarity threshold
+    if res.fts_rank is None and similarity < min_score:
+      continue
+
+    pid = res.paper_id
+    if pid not in paper_best or hybrid_score > paper_best[pid]["score"]:
+      paper_best[pid] = {
+        "paper_id": pid,
+        "title": res.paper_title,
+        "authors": res.paper_authors,
+        "page": res.page,
+        "text": make_snippet(res.text, query),
+        "score": hybrid_score,
+      }
+      passages[pid] = f"{res.paper_title}. {res.text}"
+
+  if field_hits:
+    paper_best = fuse_fields(
+      paper_best, field_hits, query, min_score,
+      chunk_weight=search_settings.chunk_field_weight,
+      title_weight=title_weight,
+      abstract_weight=abstract_weight,
+      rrf_k=search_settings.rrf_k,
+    )
+    for pid, hit in field_hits.items():
+      if pid in paper_best and pid not in passages:
+        passages[pid] = f"{hit['title']}. {hit['abstract'] or ''}"
+
+  for result in paper_best.values():
+    result["score"] = round(result["score"], 4)
+
+  ranked = sorted(paper_best.values(), key=lambda x: x["score"], reverse=True)
+  # Optional cross-encoder pass over the best chunk of each paper
+  ranked = rerank(query, ranked, lambda r: passages[r["paper_id"]])
+  return ranked[:top_k]
+
+
+# Queries up to this many words are treated as title-like (see semantic_search)
+TITLE_QUERY_MAX_WORDS = 4
+
+
+def field_candidates(query_emb, limit, paper_qs=None, title=True, abstract=True):
+  """
+  ANN-search the paper-level title and abstract embeddings (each through its
+  own HNSW index) in one statement. Returns {paper_id: {title_rank,
+  title_distance, abstract_rank, abstract_distance, best_rank, title,
+  authors, abstract}}; ranks/distances are None for the field that missed.
+  """
+  vec = _vector_literal(query_emb)
+  filter_sql, filter_params = "", []
+  if paper_qs is not None:
+    ids_sql, ids_params = paper_qs.order_by().values('id').query.sql_with_params()
+    filter_sql, filter_params = f"AND id IN ({ids_sql})", list(ids_params)
+
+  def leg(column, enabled):
+    if not enabled:
+      return "SELECT NULL::bigint AS id, NULL::float8 AS distance WHERE false", []
+    sql = f"""
+      SELECT id, {column} <=> %s::vector AS distance
+      FROM papers_paper
+      WHERE {column} IS NOT NULL {filter_sql}
+      ORDER BY {column} <=> %s::vector
+      LIMIT %s"""
+    return sql, [vec] + filter_params + [vec, int(limit)]
+
+  title_sql, title_params = leg("title_embedding", title)
+  abstract_sql, abstract_params = leg("abstract_embedding", abstract)
+  sql = f"""
+    WITH t AS ({title_sql}),
+    a AS ({abstract_sql}),
+    t_ranked AS (SELECT id, distance, ROW_NUMBER() OVER (ORDER BY distance) AS rank FROM t),
+    a_ranked AS (SELECT id, distance, ROW_NUMBER() OVER (ORDER BY distance) AS rank FROM a)
+    SELECT p.id, tr.rank, tr.distance, ar.rank, ar.distance, p.title, p.authors, p.abstract
+    FROM t_ranked tr
+    FULL OUTER JOIN a_ranked ar ON ar.id = tr.id
+    JOIN papers_paper p ON p.id = COALESCE(tr.id, ar.id)
+  """
+
+  with transaction.atomic():
+    configure_ann_scan(
+      ef_search=max(get_search_settings().hnsw_ef_search, int(limit)),
+      iterative=paper_qs is not None,
+    )
+    with connection.cursor() as cursor:
+      cursor.execute(sql, title_params + abstract_params)
+      rows = cursor.fetchall()
+
+  hits = {}
+  for pid, t_rank, t_dist, a_rank, a_dist, title_text, authors, abstract_text in rows:
+    hits[pid] = {
+      "title_rank": t_rank,
+      "title_distance": t_dist,
+      "abstract_rank": a_rank,
+      "abstract_distance": a_dist,
+      "best_rank": min(r for r in (t_rank, a_rank) if r is not None),
+      "title": title_text,
+      "authors": authors,
+      "abstract": abstract_text,
+    }
+  return hits
+
+
+def fuse_fields(paper_best, field_hits, query, min_score, chunk_weight=1.0, title_weight=0.5, abstract_weight=0.5, rrf_k=60):
+  """
+  Combine per-paper chunk scores (already in [0, 1]) with title and abstract
+  ranks: weighted sum of the chunk score and rank-normalized reciprocal
+  ranks, divided by the total weight. Papers found only through a field
+  must clear `min_score` on that field; their snippet comes from the abstract.
+  """
+  total = (chunk_weight + title_weight + abstract_weight) or 1.0
+
+  def field_score(rank):
+    return (rrf_k + 1) / (rrf_k + rank) if rank is not None else 0.0
+
+  fused = {}
+  for pid in set(paper_best) | set(field_hits):
+    result = paper_best.get(pid)
+    hit = field_hits.get(pid)
+    if result is None:
+      similarity = max(1 - d for d in (hit["title_distance"], hit["abstract_distance"]) if d is not None)
+      if similarity < min_score:
+        continue
+      result = {
+        "paper_id": pid,
+        "title": hit["title"],
+        "authors": hit["authors"],
+        "page": None,
+        "text": make_snippet(hit["abstract"] or "", query),
+        "score": 0.0,
+      }
+    else:
+      result = dict(result)
+
+    score = chunk_weight * result["score"]
+    if hit is not None:
+      score += title_weight * field_score(hit["title_rank"])
+      score += abstract_weight * field_score(hit["abstract_rank"])
+    result["score"] = score / total
+    fused[pid] = result
+  return fused
+
+
+EMBEDDING_DEADLINE_SECONDS = 5.0
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _search_executor():
+  """Thread pool for network-bound search work, created after gunicorn forks."""
+  global _executor
+  if _executor is None:
+    with _executor_lock:
+      if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search")
+  return _executor
+
+
+def embed_query(query):
+  """
+  Embed a search query with the GenAI client. Returns a NumPy vector or None.
+  Embeddings are cached per normalized query (see utils/search_cache.py).
+  """
+  cached = get_cached_embedding(query, GENAI_EMBEDDING_MODEL)
+  if cached is not None:
+    return cached
+
   client = get_model()
   if not client:
     print("[!] Could not initialize GenAI client. Aborting search.")
-    return []
+    return None
 
-  # ✅ REPLACE SentenceTransformer.encode with GenAI embed_texts (using RETRIEVAL_QUERY)
   try:
     response = client.models.embed_content(
       model=GENAI_EMBEDDING_MODEL,
@@ -310,162 +669,283 @@ def semantic_search(query, top_k=None, min_score=None, bm25_weight=None, vector_
     )
     # The API returns a list of embeddings, so we take the first one
     if hasattr(response, 'embeddings'):
-        query_emb = np.array(response.embeddings[0].values)
+        embedding = np.array(response.embeddings[0].values, dtype=np.float32)
     elif hasattr(response, 'values'):
-        query_emb = np.array(response.values)
+        embedding = np.array(response.values, dtype=np.float32)
     else:
         print(f"❌ Unexpected response structure: {dir(response)}")
-        return []
+        return None
+    set_cached_embedding(query, GENAI_EMBEDDING_MODEL, embedding)
+    return embedding
   except Exception as e:
     print(f"❌ Failed to embed query: {e}")
     import traceback
     traceback.print_exc()
-    return []
-    
-  query_emb_list = query_emb.tolist()
+    return None
 
-  search_vector = SearchVector('text', weight='A')
-  search_query = SearchQuery(query)
-  
-  # ✅ Use configurable initial limit
-  initial_limit = max(
-    search_settings.hybrid_search_min_results,
-    top_k * search_settings.hybrid_search_multiplier
-  )
-  
-  # Single query with both BM25 and vector distance (rest of the logic remains the same)
-  results = list(
-    PaperChunk.objects
-    .select_related('paper')
-    .annotate(
-      bm25=SearchRank(search_vector, search_query),
-      distance=CosineDistance("embedding", query_emb_list)
-    )
-    .filter(bm25__gt=0)
-    .order_by('-bm25')[:initial_limit]
-  )
-  
-  if not results:
-    # Fallback to pure vector search
-    results = (
-      PaperChunk.objects
-      .select_related('paper')
-      .annotate(distance=CosineDistance("embedding", query_emb_list))
-      .order_by("distance")[:top_k]
+
+def _vector_literal(vec):
+  return "[" + ",".join(f"{float(x):.8g}" for x in vec) + "]"
+
+
+def hybrid_candidates(search_query, query, query_emb, limit, paper_qs=None, shortlist_size=0, ann_hits=None, fts_hits=None, shortlist_ids=None):
+  """
+  Retrieve the BM25 top-`limit` and the ANN top-`limit` chunks in one SQL
+  round-trip (two CTEs joined with a FULL OUTER JOIN). Each returned chunk
+  carries `bm25`, `fts_rank`, `distance` and `ann_rank` (ranks are None when
+  the chunk did not come from that retriever), plus `paper_title` and
+  `paper_authors`.
+
+  `paper_qs` restricts both retrievers to those papers inside the query.
+  The HNSW scan runs with pgvector iterative scans so a filtered ANN search
+  still fills `limit` rows instead of returning the few survivors of the
+  unfiltered top-k.
+
+  With `shortlist_size`, the vector side is two-level: the nearest
+  `shortlist_size` papers by centroid are picked first and only their chunks
+  are ranked, with an exact scan (a filtered HNSW scan would only post-filter
+  the global nearest chunks). Papers that have no centroid yet are always kept. BM25 still
+  runs over every (filtered) chunk so exact keyword hits are never lost.
+
+  `ann_hits` ([(chunk_id, similarity), ...] from utils/vector_store.py)
+  replaces the pgvector ANN scan when given. Likewise `fts_hits`
+  ([(chunk_id, bm25), ...] from `bm25_rank`, computed while the query was
+  being embedded) replaces the BM25 CTE. Without `query_emb` only the
+  keyword side is used. `shortlist_ids` (e.g. the papers whose title matched)
+  replaces the centroid shortlist.
+  """
+  chunk_qs = PaperChunk.objects.all()
+  paper_ids_sql, paper_ids_params = "", []
+  if paper_qs is not None:
+    chunk_qs = chunk_qs.filter(paper__in=paper_qs)
+    paper_ids_sql, paper_ids_params = paper_qs.order_by().values('id').query.sql_with_params()
+    paper_ids_params = list(paper_ids_params)
+
+  vec = _vector_literal(query_emb) if query_emb is not None else None
+  exact_shortlist = False
+  if vec is None:
+    shortlist_sql, shortlist_params = "", []
+    ann_sql, ann_params = "SELECT NULL::bigint AS chunk_id, NULL::float8 AS distance WHERE false", []
+  elif ann_hits is not None:
+    shortlist_sql, shortlist_params = "", []
+    ann_sql = "SELECT * FROM unnest(%s::bigint[], %s::float8[]) AS ann(chunk_id, distance)"
+    ann_params = [[cid for cid, _ in ann_hits], [1 - sim for _, sim in ann_hits]]
+  elif shortlist_ids is not None:
+    shortlist_sql = """
+    shortlist AS (
+      SELECT unnest(%s::bigint[]) AS id
+    ),"""
+    shortlist_params = [list(shortlist_ids)]
+    exact_shortlist = True
+  elif shortlist_size:
+    and_filter = f"AND id IN ({paper_ids_sql})" if paper_ids_sql else ""
+    shortlist_sql = f"""
+    shortlist AS (
+      (SELECT id FROM papers_paper
+       WHERE centroid_embedding IS NOT NULL {and_filter}
+       ORDER BY centroid_embedding <=> %s::vector
+       LIMIT %s)
+      UNION
+      SELECT id FROM papers_paper
+      WHERE centroid_embedding IS NULL AND is_indexed {and_filter}
+    ),"""
+    shortlist_params = paper_ids_params + [vec, int(shortlist_size)] + paper_ids_params
+    exact_shortlist = True
+  else:
+    shortlist_sql, shortlist_params = "", []
+    ann_filter_sql = f"WHERE paper_id IN ({paper_ids_sql})" if paper_ids_sql else ""
+    ann_filter_params = paper_ids_params
+
+  if exact_shortlist:
+    # MATERIALIZED keeps the planner from switching to the HNSW index
+    shortlist_sql += """
+    shortlist_chunks AS MATERIALIZED (
+      SELECT id AS chunk_id, embedding <=> %s::vector AS distance
+      FROM papers_paperchunk
+      WHERE paper_id IN (SELECT id FROM shortlist)
+    ),"""
+    shortlist_params = shortlist_params + [vec]
+    ann_sql = "SELECT chunk_id, distance FROM shortlist_chunks ORDER BY distance LIMIT %s"
+    ann_params = [int(limit)]
+  elif vec is not None and ann_hits is None:
+    ann_sql = f"""
+      SELECT id AS chunk_id, embedding <=> %s::vector AS distance
+      FROM papers_paperchunk
+      {ann_filter_sql}
+      ORDER BY embedding <=> %s::vector
+      LIMIT %s"""
+    ann_params = [vec] + ann_filter_params + [vec, int(limit)]
+
+  if fts_hits is not None:
+    fts_sql = "SELECT * FROM unnest(%s::bigint[], %s::float8[]) AS fts(chunk_id, bm25)"
+    fts_params = [[cid for cid, _ in fts_hits], [score for _, score in fts_hits]]
+  elif search_query is not None:
+    fts_sql, fts_params = bm25_sql(search_query, query, candidate_qs=chunk_qs, limit=limit)
+  else:
+    fts_sql, fts_params = "SELECT NULL::bigint AS chunk_id, NULL::float AS bm25 WHERE false", []
+
+  if vec is not None:
+    distance_sql = "COALESCE(fused.ann_distance, c.embedding <=> %s::vector)"
+  else:
+    # Keyword-only fallback: no similarity to report
+    distance_sql = "1.0::float8"
+
+  sql = f"""
+    WITH {shortlist_sql}
+    fts AS (
+      {fts_sql}
+    ),
+    fts_ranked AS (
+      SELECT chunk_id, bm25, ROW_NUMBER() OVER (ORDER BY bm25 DESC) AS fts_rank
+      FROM fts
+    ),
+    ann AS (
+      {ann_sql}
+    ),
+    ann_ranked AS (
+      SELECT chunk_id, distance, ROW_NUMBER() OVER (ORDER BY distance) AS ann_rank
+      FROM ann
+    ),
+    fused AS (
+      SELECT COALESCE(f.chunk_id, a.chunk_id) AS chunk_id,
+             COALESCE(f.bm25, 0) AS bm25, f.fts_rank,
+             a.distance AS ann_distance, a.ann_rank
+      FROM fts_ranked f FULL OUTER JOIN ann_ranked a ON a.chunk_id = f.chunk_id
     )
-    output = []
-    for res in results:
-      similarity = 1 - res.distance
-      if similarity < min_score:
-        continue
-      output.append({
-        "paper_id": res.paper.id,
-        "title": res.paper.title,
-        "authors": res.paper.authors,
-        "page": res.page,
-        "text": highlight_query(res.text, query),
-        "score": round(similarity, 4),
-      })
-    return output
-  
-  # Calculate hybrid scores in Python (already have both scores from annotation)
-  bm25_scores = [r.bm25 for r in results]
-  vector_scores = [1 - r.distance for r in results]
-  
-  def norm(x, scores):
-    if not scores or max(scores) == min(scores):
-      return 1.0 if scores and x == max(scores) else 0.0
-    return (x - min(scores)) / (max(scores) - min(scores))
-  
-  paper_best = {}
-  for res in results:
-    vector_score = 1 - res.distance
-    
-    bm25_norm = norm(res.bm25, bm25_scores)
-    vector_norm = norm(vector_score, vector_scores)
-    hybrid_score = bm25_weight * bm25_norm + vector_weight * vector_norm
-    
-    # ✅ Filter by hybrid_score instead
-    if hybrid_score < min_score:
-      continue
-      
-    pid = res.paper.id
-    if pid not in paper_best or hybrid_score > paper_best[pid]["score"]:
-      paper_best[pid] = {
-        "paper_id": pid,
-        "title": res.paper.title,
-        "authors": res.paper.authors,
-        "page": res.page,
-        "text": highlight_query(res.text, query),
-        "score": round(hybrid_score, 4),
-      }
-  
-  return sorted(paper_best.values(), key=lambda x: x["score"], reverse=True)[:top_k]
+    SELECT c.id, c.paper_id, c.page, c.chunk_id, c.text,
+           p.title AS paper_title, p.authors AS paper_authors,
+           fused.bm25, fused.fts_rank, fused.ann_rank,
+           {distance_sql} AS distance
+    FROM fused
+    JOIN papers_paperchunk c ON c.id = fused.chunk_id
+    JOIN papers_paper p ON p.id = c.paper_id
+  """
+  params = shortlist_params + list(fts_params) + ann_params + ([vec] if vec is not None else [])
+
+  with transaction.atomic():
+    if vec is not None and ann_hits is None:
+      configure_ann_scan(
+        ef_search=max(get_search_settings().hnsw_ef_search, int(limit)),
+        iterative=paper_qs is not None,
+      )
+    return list(PaperChunk.objects.raw(sql, params))
 
 
-def keyword_search(query, top_k=None):
+def configure_ann_scan(ef_search=None, iterative=False):
   """
-  Simple keyword search across chunks.
-  (Function remains the same)
+  Set per-transaction HNSW scan options (like SET LOCAL):
+  - `ef_search`: candidate list size; higher = better recall, slower
+  - `iterative`: let filtered scans keep walking the graph until LIMIT
+    is met (pgvector >= 0.8)
+  Must run inside a transaction; options the installed pgvector does not
+  know are skipped and the default behaviour is kept.
+  """
+  options = []
+  if ef_search:
+    options.append(("hnsw.ef_search", str(int(ef_search))))
+  if iterative:
+    options.append(("hnsw.iterative_scan", "relaxed_order"))
+  for name, value in options:
+    try:
+      with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT set_config(%s, %s, true)", [name, value])
+    except DatabaseError as e:
+      print(f"[SEARCH] {name} unavailable: {e}")
+
+
+def fuse_candidates(candidates, method="rrf", bm25_weight=0.5, vector_weight=0.5, rrf_k=60):
+  """
+  Combine keyword and vector signals into one score in [0, 1].
+  - "rrf": weighted reciprocal rank fusion, normalized by the best possible score
+  - "weighted": min-max normalized BM25 and cosine similarity, weighted
+  Returns [(chunk, score), ...] best-first.
+  """
+  fused = []
+  if method == "weighted":
+    bm25_scores = [c.bm25 for c in candidates if c.fts_rank is not None]
+    vector_scores = [1 - c.distance for c in candidates]
+
+    def norm(x, scores):
+      if not scores:
+        return 0.0
+      if max(scores) == min(scores):
+        return 1.0 if x == max(scores) else 0.0
+      return (x - min(scores)) / (max(scores) - min(scores))
+
+    for c in candidates:
+      bm25_norm = norm(c.bm25, bm25_scores) if c.fts_rank is not None else 0.0
+      vector_norm = norm(1 - c.distance, vector_scores)
+      fused.append((c, bm25_weight * bm25_norm + vector_weight * vector_norm))
+  else:
+    best = (bm25_weight + vector_weight) / (rrf_k + 1) or 1.0
+    for c in candidates:
+      score = 0.0
+      if c.fts_rank is not None:
+        score += bm25_weight / (rrf_k + c.fts_rank)
+      if c.ann_rank is not None:
+        score += vector_weight / (rrf_k + c.ann_rank)
+      fused.append((c, score / best))
+
+  return sorted(fused, key=lambda x: x[1], reverse=True)
+
+
+def keyword_search(query, top_k=None, filters=None):
+  """
+  Full-text keyword search across chunks.
+  Matches come from the GIN-indexed `search_vector` column, so the cost
+  scales with the number of matching chunks rather than the corpus size.
+  Papers are scored by the sum of their chunks' BM25 (see utils/bm25.py).
   """
   if not query:
     return []
 
+  search_query = build_search_query(query)
+  if search_query is None:
+    return []
+
   search_settings = get_search_settings()
   if top_k is None:
     top_k = search_settings.top_k_results
 
-  qs = (
-    PaperChunk.objects
-    .filter(text__icontains=query)
-    .select_related("paper")[:search_settings.max_chunks_scan]
-  )
+  paper_qs = filter_papers(filters)
+  candidate_qs = PaperChunk.objects.filter(paper__in=paper_qs) if paper_qs is not None else None
+  ranked = bm25_rank(search_query, query, candidate_qs=candidate_qs, limit=search_settings.max_chunks_scan)
 
   print(f"[KEYWORD SEARCH] Using settings from database:")
-  print(f"  - top_k: {top_k}")
-  print(f"  - max_chunks_scan: {search_settings.max_chunks_scan}")
+  print(f"  - top_k: {top_k}")
+  print(f"  - max_chunks_scan: {search_settings.max_chunks_scan}")
 
-  pattern = re.compile(re.escape(query), re.IGNORECASE)
   per_paper = {}
-  for c in qs:
-    text = c.text or ""
-    count = len(pattern.findall(text))
-    if count == 0:
+  chunk_paper = dict(
+    PaperChunk.objects.filter(id__in=[cid for cid, _ in ranked]).values_list('id', 'paper_id')
+  )
+  best_chunk = {}
+  for cid, score in ranked:
+    pid = chunk_paper.get(cid)
+    if pid is None:
       continue
-    pid = c.paper.id
     if pid not in per_paper:
-      per_paper[pid] = {
-        "paper_id": pid,
-        "title": c.paper.title,
-        "authors": c.paper.authors,
-        "count": 0,
-        "page": c.page,
-        "snippet": "",
-      }
-    per_paper[pid]["count"] += count
-    # store the first matching snippet (highlighted)
-    if not per_paper[pid]["snippet"]:
-      per_paper[pid]["snippet"] = highlight_query(text, query)
-
-  results = sorted(per_paper.values(), key=lambda x: x["count"], reverse=True)
+      # Rows arrive best-first, so the first chunk seen is the paper's best
+      per_paper[pid] = {"paper_id": pid, "score": 0.0}
+      best_chunk[pid] = cid
+    per_paper[pid]["score"] += score
+
+  results = sorted(per_paper.values(), key=lambda x: x["score"], reverse=True)[:top_k]
+  chunks = PaperChunk.objects.select_related("paper").in_bulk(
+    [best_chunk[r["paper_id"]] for r in results]
+  )
 
   output = []
-  for r in results[:top_k]:
+  for r in results:
+    c = chunks[best_chunk[r["paper_id"]]]
     output.append({
       "paper_id": r["paper_id"],
-      "title": r["title"],
-      "authors": r["authors"],
-      "page": r.get("page"),
-      "text": r.get("snippet", ""),
-      "score": float(r["count"]),
+      "title": c.paper.title,
+      "authors": c.paper.authors,
+      "page": c.page,
+      "text": make_snippet(c.text, query),
+      "score": round(float(r["score"]), 4),
       "match_type": "keyword",
     })
 
   return output
-
-
-def highlight_query(text, query):
-  pattern = re.compile(re.escape(query), re.IGNORECASE)
-  return pattern.sub(r"<mark>\g<0></mark>", text)
-
-
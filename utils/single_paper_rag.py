@@ -3,12 +3,17 @@
 from google import genai
 from google.genai import types
 import os
+from asgiref.sync import sync_to_async
 from dotenv import load_dotenv
 from django.conf import settings
+from django.db.models import Q
 import numpy as np
 from papers.models import PaperChunk
 from pgvector.django import CosineDistance
 from typing import List, Tuple
+from staff.utils import get_search_settings
+from utils.rerank import is_enabled as rerank_enabled, rerank
+from utils.chunk_matrix_cache import get_paper_chunks
 
 # --- Environment Setup ---
 BASE_DIR = settings.BASE_DIR
@@ -81,27 +86,50 @@ def get_gemini_embedding(text: str, task_type: str = "RETRIEVAL_QUERY") -> np.nd
 # Helper Functions
 # ----------------------------
 
-def get_surrounding_chunks(db_id: int, paper_id: int, window: int = 1) -> List[PaperChunk]:
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping or adjacent inclusive (start, end) ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def expand_context(hits: List[PaperChunk], paper_id: int, window: int = 1) -> List[PaperChunk]:
     """
-    Retrieve chunks before and after a given chunk to provide more context.
-    Uses the chunk_id field from your model for ordering.
+    The retrieved chunks plus their surroundings, fetched in one query:
+    every chunk within `window` pages of a hit, or within `window` chunks
+    (chunk_id order) for hits without a page number. Overlapping windows
+    are merged first, so each chunk is read once.
     """
+    if not hits:
+        return []
+
+    page_ranges, ordinal_ranges = [], []
+    for chunk in hits:
+        if chunk.page:
+            page_ranges.append((max(1, chunk.page - window), chunk.page + window))
+        else:
+            ordinal_ranges.append((max(0, chunk.chunk_id - window), chunk.chunk_id + window))
+
+    condition = Q(id__in=[chunk.id for chunk in hits])
+    for start, end in _merge_ranges(page_ranges):
+        condition |= Q(page__range=(start, end))
+    for start, end in _merge_ranges(ordinal_ranges):
+        condition |= Q(chunk_id__range=(start, end))
+
     try:
-        target_chunk = PaperChunk.objects.get(id=db_id)
-        page_num = target_chunk.page
-        target_chunk_id = target_chunk.chunk_id
-        
-        # Get chunks from nearby pages (window pages before and after)
-        surrounding = PaperChunk.objects.filter(
-            paper_id=paper_id,
-            page__gte=max(1, page_num - window) if page_num else 1,
-            page__lte=(page_num + window) if page_num else 999999,
-        ).order_by('page', 'chunk_id')  # Order by page, then by chunk_id
-        
-        return list(surrounding)
+        return list(
+            PaperChunk.objects
+            .filter(condition, paper_id=paper_id)
+            .defer("embedding")
+            .order_by("page", "chunk_id")
+        )
     except Exception as e:
         print(f"Error getting surrounding chunks: {e}")
-        return []
+        return list(hits)
 
 
 def deduplicate_chunks(chunks: List[PaperChunk]) -> List[PaperChunk]:
@@ -118,7 +146,7 @@ def deduplicate_chunks(chunks: List[PaperChunk]) -> List[PaperChunk]:
 def rerank_chunks(query: str, chunks: List[Tuple[PaperChunk, float]]) -> List[Tuple[PaperChunk, float]]:
     """
     Simple reranking based on keyword overlap and distance.
-    For production, consider using a cross-encoder model.
+    The optional cross-encoder pass (utils.rerank) runs on top of this order.
     """
     query_words = set(query.lower().split())
     
@@ -136,62 +164,68 @@ def rerank_chunks(query: str, chunks: List[Tuple[PaperChunk, float]]) -> List[Tu
 # Enhanced RAG Query
 # ----------------------------
 
-def query_rag(
-    paper_id: int, 
-    user_query: str, 
+GENERATION_MODEL = "gemma-3-27b-it"
+
+
+def build_rag_prompt(
+    paper_id: int,
+    user_query: str,
     top_k: int = 5,
     use_context_expansion: bool = True,
     use_hybrid_mode: bool = True,
-    temperature: float = 0.3
 ):
     """
-    Enhanced RAG pipeline with Gemini embeddings:
-    - Gemini gemini-embedding-001 for query encoding
-    - More chunks retrieved
-    - Context expansion (surrounding chunks)
-    - Optional hybrid mode (paper + model knowledge)
-    - Better prompting
+    Retrieval and prompt building shared by query_rag and its streaming
+    variants. Returns (prompt, context_chunks, None), or (None, [], message)
+    when the question can't be answered from the paper.
     """
-    
+
     # 1. Embed query using Gemini (matching your working module's approach)
     try:
         query_emb = get_gemini_embedding(user_query, task_type="RETRIEVAL_QUERY")
-        query_emb_list = query_emb.tolist()
     except Exception as e:
         print(f"❌ Error embedding query: {e}")
-        return "Sorry, I had trouble processing your question."
+        return None, [], "Sorry, I had trouble processing your question."
 
     # 2. Retrieve initial chunks with scores
     try:
-        retrieved = (
-            PaperChunk.objects
-            .filter(paper_id=paper_id)
-            .annotate(distance=CosineDistance("embedding", query_emb_list))
-            .order_by("distance")[:top_k]
-        )
-        
-        chunks_with_scores = [(chunk, chunk.distance) for chunk in retrieved]
+        # Over-fetch when the cross-encoder will pick the final top_k
+        fetch_k = max(top_k, get_search_settings().rerank_top_n) if rerank_enabled() else top_k
+        # In-memory matrix of the paper's chunks (cached across chat turns);
+        # papers too large for the cache use pgvector
+        paper_chunks = get_paper_chunks(paper_id)
+        if paper_chunks is not None:
+            chunks_with_scores = paper_chunks.search(query_emb, fetch_k)
+        else:
+            retrieved = (
+                PaperChunk.objects
+                .filter(paper_id=paper_id)
+                .annotate(distance=CosineDistance("embedding", query_emb.tolist()))
+                .order_by("distance")[:fetch_k]
+            )
+            chunks_with_scores = [(chunk, chunk.distance) for chunk in retrieved]
         
         # Optional: Rerank results
         chunks_with_scores = rerank_chunks(user_query, chunks_with_scores)
+        chunks_with_scores = rerank(user_query, chunks_with_scores, lambda item: item[0].text)[:top_k]
         
     except Exception as e:
         print(f"❌ Error during retrieval: {e}")
         import traceback
         traceback.print_exc()
-        return "Sorry, I had trouble searching the paper's contents."
+        return None, [], "Sorry, I had trouble searching the paper's contents."
 
     if not chunks_with_scores:
-        return "I couldn't find relevant information in this paper."
+        return None, [], "I couldn't find relevant information in this paper."
 
     # 3. Expand context with surrounding chunks
-    all_chunks = []
-    if use_context_expansion:
-        for chunk, score in chunks_with_scores:
-            surrounding = get_surrounding_chunks(chunk.id, paper_id, window=1)
-            all_chunks.extend(surrounding)
+    hits = [chunk for chunk, _ in chunks_with_scores]
+    if not use_context_expansion:
+        all_chunks = hits
+    elif paper_chunks is not None:
+        all_chunks = paper_chunks.expand(hits, window=1)
     else:
-        all_chunks = [chunk for chunk, _ in chunks_with_scores]
+        all_chunks = expand_context(hits, paper_id, window=1)
     
     # Deduplicate and sort by page/position
     all_chunks = deduplicate_chunks(all_chunks)
@@ -239,6 +273,46 @@ Always reference page numbers when providing specific information.
 
 **ANSWER:**"""
 
+    return prompt, all_chunks, None
+
+
+def retrieval_footer(all_chunks) -> str:
+    """Metadata appended to every answer."""
+    return f"\n\n---\n*Retrieved from {len(all_chunks)} chunks across {len(set(c.page for c in all_chunks))} pages*"
+
+
+def _generation_config(temperature: float):
+    return {
+        "temperature": temperature,
+        "max_output_tokens": 2048,
+    }
+
+
+def query_rag(
+    paper_id: int, 
+    user_query: str, 
+    top_k: int = 5,
+    use_context_expansion: bool = True,
+    use_hybrid_mode: bool = True,
+    temperature: float = 0.3
+):
+    """
+    Enhanced RAG pipeline with Gemini embeddings:
+    - Gemini gemini-embedding-001 for query encoding
+    - More chunks retrieved
+    - Context expansion (surrounding chunks)
+    - Optional hybrid mode (paper + model knowledge)
+    - Better prompting
+
+    Returns the finished answer; see stream_query_rag
+    to show it while it is generated.
+    """
+    prompt, all_chunks, error = build_rag_prompt(
+        paper_id, user_query, top_k, use_context_expansion, use_hybrid_mode
+    )
+    if error:
+        return error
+
     # 6. Generate with Gemini
     client = get_genai_client()
     if not client:
@@ -246,19 +320,13 @@ Always reference page numbers when providing specific information.
 
     try:
         response = client.models.generate_content(
-            model="gemma-3-27b-it",
+            model=GENERATION_MODEL,
             contents=prompt,
-            config={
-                "temperature": temperature,
-                "max_output_tokens": 2048,
-            }
+            config=_generation_config(temperature),
         )
         
         # Add metadata about retrieval
-        answer = response.text
-        metadata = f"\n\n---\n*Retrieved from {len(all_chunks)} chunks across {len(set(c.page for c in all_chunks))} pages*"
-        
-        return answer + metadata
+        return response.text + retrieval_footer(all_chunks)
         
     except Exception as e:
         print(f"❌ Error during generation: {e}")
@@ -267,6 +335,49 @@ Always reference page numbers when providing specific information.
         return "Sorry, I encountered an error generating an answer."
 
 
+def stream_query_rag(
+    paper_id: int,
+    user_query: str,
+    top_k: int = 5,
+    use_context_expansion: bool = True,
+    use_hybrid_mode: bool = True,
+    temperature: float = 0.3
+):
+    """
+    query_rag as a generator of text pieces, yielded as the model produces
+    them. Errors are yielded as text, like query_rag returns them. Closing
+    the generator (client went away) stops reading the provider stream.
+    """
+    prompt, all_chunks, error = build_rag_prompt(
+        paper_id, user_query, top_k, use_context_expansion, use_hybrid_mode
+    )
+    if error:
+        yield error
+        return
+
+    client = get_genai_client()
+    if not client:
+        yield "Sorry, AI generation service not configured."
+        return
+
+    try:
+        for chunk in client.models.generate_content_stream(
+            model=GENERATION_MODEL,
+            contents=prompt,
+            config=_generation_config(temperature),
+        ):
+            if chunk.text:
+                yield chunk.text
+    except Exception as e:
+        print(f"❌ Error during generation: {e}")
+        import traceback
+        traceback.print_exc()
+        yield "\n\nSorry, I encountered an error generating an answer."
+        return
+
+    yield retrieval_footer(all_chunks)
+
+
 # ----------------------------
 # Optional: Multi-query RAG
 # ----------------------------
@@ -347,9 +458,9 @@ Return only the 3 questions, numbered 1-3, nothing else."""
 **ANSWER:**"""
         
         response = client.models.generate_content(
-            model="gemma-3-27b-it",
+            model=GENERATION_MODEL,
             contents=prompt,
-            config={"temperature": 0.3, "max_output_tokens": 2048}
+            config=_generation_config(0.3),
         )
         
         return response.text + f"\n\n---\n*Multi-query retrieval: {len(all_chunks)} unique chunks*"
@@ -0,0 +1,112 @@
+# utils/snippets.py
+# Short highlighted excerpts for search results. Instead of returning a whole
+# chunk wrapped in <mark>, pick the window of text that covers the most
+# distinct query terms, escape it once and highlight every term inside it.
+
+import re
+
+from django.utils.html import escape
+
+SNIPPET_CHARS = 200
+# Characters of context kept before the first match in the window
+SNIPPET_LEAD = 40
+ELLIPSIS = "…"
+
+_TERM_RE = re.compile(r"[\w']+", re.UNICODE)
+_IGNORED_TERMS = {"and", "or", "not"}
+
+
+def query_terms(query):
+    """Distinct lowercase terms of a search query (operators and quotes dropped)."""
+    terms = []
+    for word in _TERM_RE.findall((query or "").lower()):
+        word = word.strip("'")
+        if len(word) < 2 or word in _IGNORED_TERMS or word in terms:
+            continue
+        terms.append(word)
+    return terms
+
+
+def _term_pattern(terms):
+    if not terms:
+        return None
+    alternatives = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+    # Prefix match so "learn" also marks "learning" (close to what the stemmer matched)
+    return re.compile(rf"\b({alternatives})\w*", re.IGNORECASE)
+
+
+def _best_window(matches, max_chars):
+    """
+    Index of the match that starts the window with the most distinct terms
+    (ties: more matches, then earliest). Two-pointer sweep, O(len(matches)).
+    """
+    best, best_key = 0, (0, 0)
+    counts = {}
+    right = 0
+    for left, m in enumerate(matches):
+        limit = m.start() + max_chars
+        while right < len(matches) and matches[right].end() <= limit:
+            term = matches[right].group(1).lower()
+            counts[term] = counts.get(term, 0) + 1
+            right += 1
+        key = (len(counts), right - left)
+        if key > best_key:
+            best, best_key = left, key
+        term = m.group(1).lower()
+        if counts.get(term):
+            counts[term] -= 1
+            if not counts[term]:
+                del counts[term]
+    return best
+
+
+def _snap(text, start, end):
+    """Move window edges to word boundaries."""
+    if start > 0:
+        space = text.find(" ", start)
+        if space != -1 and space < end:
+            start = space + 1
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        if space > start:
+            end = space
+    return start, end
+
+
+def make_snippet(text, query, max_chars=SNIPPET_CHARS):
+    """
+    Return an HTML-safe excerpt of at most ~`max_chars` characters around the
+    best cluster of query terms, with every term wrapped in <mark>. Falls
+    back to the start of the text when nothing matches.
+    """
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if not text:
+        return ""
+
+    pattern = _term_pattern(query_terms(query))
+    matches = list(pattern.finditer(text)) if pattern else []
+
+    if matches:
+        anchor = matches[_best_window(matches, max_chars)].start()
+        start = max(0, anchor - SNIPPET_LEAD)
+    else:
+        start = 0
+    end = min(len(text), start + max_chars)
+    if end == len(text):
+        start = max(0, end - max_chars)
+    start, end = _snap(text, start, end)
+
+    parts = [ELLIPSIS] if start > 0 else []
+    pos = start
+    for m in matches:
+        if m.start() < start:
+            continue
+        if m.end() > end:
+            break
+        parts.append(escape(text[pos:m.start()]))
+        parts.append(f"<mark>{escape(m.group(0))}</mark>")
+        pos = m.end()
+    parts.append(escape(text[pos:end]))
+    if end < len(text):
+        parts.append(ELLIPSIS)
+    return "".join(parts)
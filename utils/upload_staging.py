@@ -0,0 +1,207 @@
+# utils/upload_staging.py
+# Keeps the file posted to the metadata preview step (and what was parsed
+# out of it) under an expiring upload token, so the final upload can attach
+# it instead of sending and parsing the same bytes a second time.
+#
+# Expired tokens are purged whenever a file is staged or a token is read,
+# and by `manage.py purge_staged_uploads` (run it from cron).
+
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+import fitz
+from django.conf import settings
+
+STAGING_DIRNAME = "temp_uploads"
+UPLOAD_TOKEN_TTL = 60 * 60  # 1 hour
+MANIFEST_NAME = "manifest.json"
+PAGES_NAME = "pages.json"
+
+_TOKEN_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _staging_root():
+    return os.path.join(settings.MEDIA_ROOT, STAGING_DIRNAME)
+
+
+def _token_dir(token):
+    if not token or not _TOKEN_RE.match(token):
+        return None
+    return os.path.join(_staging_root(), token)
+
+
+def extract_pdf_pages(pdf_path):
+    """
+    Return the plain text of every page of a PDF, in order.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        return [page.get_text("text") for page in doc]
+    finally:
+        doc.close()
+
+
+def stage_upload(uploaded_file, user=None):
+    """
+    Write an uploaded file into its own token directory and return
+    (token, path). The manifest is written by `finalize_staged_upload`
+    once the preview step has parsed it.
+    """
+    purge_expired_uploads()
+
+    token = uuid.uuid4().hex
+    token_dir = os.path.join(_staging_root(), token)
+    os.makedirs(token_dir, exist_ok=True)
+
+    filename = os.path.basename(uploaded_file.name)
+    path = os.path.join(token_dir, filename)
+    with open(path, "wb+") as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    manifest = {
+        "token": token,
+        "filename": filename,
+        "path": path,
+        "user_id": getattr(user, "id", None),
+        "created_at": time.time(),
+        "pages_path": None,
+        "merged_html_path": None,
+        "metadata": {},
+    }
+    _write_manifest(token_dir, manifest)
+    print(f"[Upload Token] Staged {filename} as {token}")
+    return token, path
+
+
+def finalize_staged_upload(token, metadata=None, pages=None, merged_html_path=None):
+    """
+    Record the artifacts produced while previewing a staged upload:
+    the extracted metadata, the per-page PDF text and/or the merged CHM html.
+    """
+    manifest = get_staged_upload(token)
+    if manifest is None:
+        return None
+
+    token_dir = _token_dir(token)
+    if pages is not None:
+        pages_path = os.path.join(token_dir, PAGES_NAME)
+        with open(pages_path, "w", encoding="utf-8") as f:
+            json.dump(pages, f, ensure_ascii=False)
+        manifest["pages_path"] = pages_path
+    if merged_html_path:
+        manifest["merged_html_path"] = merged_html_path
+    if metadata is not None:
+        manifest["metadata"] = metadata
+
+    _write_manifest(token_dir, manifest)
+    return manifest
+
+
+def get_staged_upload(token, user=None):
+    """
+    Return the manifest for a live token, or None if it is unknown, expired
+    or was staged by a different user.
+    """
+    purge_expired_uploads()
+    token_dir = _token_dir(token)
+    if not token_dir:
+        return None
+
+    manifest_path = os.path.join(token_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - manifest.get("created_at", 0) > UPLOAD_TOKEN_TTL:
+        discard_staged_upload(token)
+        return None
+
+    if user is not None and manifest.get("user_id") not in (None, user.id):
+        return None
+
+    if not os.path.exists(manifest.get("path", "")):
+        return None
+
+    return manifest
+
+
+def load_staged_pages(manifest):
+    """Return the cached per-page text for a staged PDF, or None."""
+    pages_path = (manifest or {}).get("pages_path")
+    if not pages_path or not os.path.exists(pages_path):
+        return None
+    try:
+        with open(pages_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def discard_staged_upload(token):
+    """
+    Delete a staged upload and everything produced from it. The merged CHM
+    output lives outside the token directory, so it is removed separately
+    unless it has already been claimed by a Paper.
+    """
+    token_dir = _token_dir(token)
+    if not token_dir or not os.path.isdir(token_dir):
+        return
+
+    try:
+        with open(os.path.join(token_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            merged_html_path = json.load(f).get("merged_html_path")
+    except (OSError, ValueError):
+        merged_html_path = None
+
+    if merged_html_path:
+        chm_dir = os.path.dirname(merged_html_path)
+        if os.path.isdir(chm_dir):
+            shutil.rmtree(chm_dir, ignore_errors=True)
+
+    shutil.rmtree(token_dir, ignore_errors=True)
+    print(f"[Upload Token] Discarded {token}")
+
+
+def release_staged_upload(token):
+    """
+    Delete the token directory after its file has been attached to a Paper.
+    Unlike `discard_staged_upload`, the merged CHM output is kept because the
+    Paper now points at it.
+    """
+    token_dir = _token_dir(token)
+    if token_dir and os.path.isdir(token_dir):
+        shutil.rmtree(token_dir, ignore_errors=True)
+
+
+def purge_expired_uploads():
+    """Remove staged uploads whose token has expired."""
+    root = _staging_root()
+    if not os.path.isdir(root):
+        return 0
+
+    removed = 0
+    now = time.time()
+    for name in os.listdir(root):
+        token_dir = os.path.join(root, name)
+        if not os.path.isdir(token_dir):
+            continue
+        try:
+            age = now - os.path.getmtime(token_dir)
+        except OSError:
+            continue
+        if age > UPLOAD_TOKEN_TTL:
+            discard_staged_upload(name)
+            removed += 1
+    return removed
+
+
+def _write_manifest(token_dir, manifest):
+    with open(os.path.join(token_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
@@ -0,0 +1,383 @@
+# utils/vector_store.py
+# Optional in-process vector store. Chunk embeddings are exported into .npy
+# matrices that every worker opens with mmap_mode='r', so
+# the pages are shared through the OS page cache instead of copied per
+# process. Queries are a BLAS matrix-vector product over L2-normalized rows
+# (dot product == cosine similarity), optionally limited to the nearest IVF
+# lists.
+#
+# Layout of one collection under settings.VECTOR_STORE_DIR:
+#   <name>.meta.json       dims, dtype, generation, IVF list count
+#   <name>.vectors.npy     main matrix (rows grouped by IVF list when built with IVF)
+#   <name>.ids.npy         database id of each row
+#   <name>.ivf.npy         IVF centroids, <name>.offsets.npy row offsets per list
+#   <name>.delta.npy / <name>.delta_ids.npy   rows added since the last build
+#   <name>.deleted.npy     ids removed or superseded since the last build
+#
+# `index_paper` appends to the delta (tombstoning only ids that were already
+# in the main matrix); the delta is always scanned exactly. Fold the delta
+# back in with `manage.py build_vector_store --compact`, or re-export with
+# `manage.py build_vector_store`.
+
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized
+    fcntl = None
+
+# Only chunks are searched (semantic_search); add collections here together
+# with a reader
+COLLECTIONS = ("chunks",)
+DIMENSIONS = 768
+# Suggest compaction once the delta grows past this share of the main matrix
+COMPACT_RATIO = 0.2
+KMEANS_ITERATIONS = 10
+
+
+def store_dir():
+    return str(getattr(settings, "VECTOR_STORE_DIR", os.path.join(settings.BASE_DIR, "vector_store")))
+
+
+def _path(name, part):
+    return os.path.join(store_dir(), f"{name}.{part}")
+
+
+def _save_npy(path, array):
+    """Write atomically so readers never map a half-written file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _load_npy(path, mmap=True):
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def _read_meta(name):
+    try:
+        with open(_path(name, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(name, meta):
+    path = _path(name, "meta.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _write_lock(name):
+    os.makedirs(store_dir(), exist_ok=True)
+    with open(_path(name, "lock"), "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _kmeans(vectors, n_lists, seed=0):
+    """Spherical k-means on a sample; returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > n_lists * 256:
+        sample = vectors[rng.choice(len(vectors), n_lists * 256, replace=False)]
+    sample = np.asarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for k in range(n_lists):
+            members = sample[assign == k]
+            if len(members):
+                centroids[k] = members.mean(axis=0)
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+def build_collection(name, ids, vectors, dtype="float32", ivf_lists=0):
+    """
+    Replace a collection with the given rows. With `ivf_lists`, rows are
+    clustered and stored grouped by list so each list is one contiguous slice.
+    """
+    with _write_lock(name):
+        _build(name, ids, vectors, dtype, ivf_lists)
+
+
+def _build(name, ids, vectors, dtype, ivf_lists):
+    ids = np.asarray(ids, dtype=np.int64)
+    vectors = normalize_rows(vectors) if len(ids) else np.zeros((0, DIMENSIONS), dtype=np.float32)
+    ivf_lists = min(int(ivf_lists or 0), len(ids))
+
+    previous = _read_meta(name) or {}
+    if ivf_lists > 1:
+        centroids = _kmeans(vectors, ivf_lists)
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        ids, vectors = ids[order], vectors[order]
+        offsets = np.searchsorted(assign[order], np.arange(ivf_lists + 1))
+        _save_npy(_path(name, "ivf.npy"), centroids)
+        _save_npy(_path(name, "offsets.npy"), offsets.astype(np.int64))
+    else:
+        ivf_lists = 0
+
+    _save_npy(_path(name, "vectors.npy"), vectors.astype(dtype))
+    _save_npy(_path(name, "ids.npy"), ids)
+    _save_npy(_path(name, "delta.npy"), np.zeros((0, vectors.shape[1]), dtype=np.float32))
+    _save_npy(_path(name, "delta_ids.npy"), np.zeros(0, dtype=np.int64))
+    _save_npy(_path(name, "deleted.npy"), np.zeros(0, dtype=np.int64))
+    _write_meta(name, {
+        "dims": int(vectors.shape[1]),
+        "dtype": dtype,
+        "count": int(len(ids)),
+        "ivf_lists": ivf_lists,
+        "generation": previous.get("generation", 0) + 1,
+    })
+    print(f"[VectorStore] Built {name}: {len(ids)} rows ({dtype}, ivf_lists={ivf_lists})")
+
+
+def upsert(name, ids, vectors):
+    """
+    Add or replace rows. New rows go to the delta matrix; ids already in the
+    main matrix are tombstoned there. Never compacts (that rebuilds the main
+    matrix); see `compact` and `build_vector_store --compact`.
+    """
+    ids = np.asarray(list(ids), dtype=np.int64)
+    if not len(ids):
+        return
+    with _write_lock(name):
+        meta = _read_meta(name)
+        if meta is None:
+            return
+        delta_ids = _load_npy(_path(name, "delta_ids.npy"), mmap=False)
+        delta = _load_npy(_path(name, "delta.npy"), mmap=False)
+        keep = ~np.isin(delta_ids, ids)
+        delta_ids = np.concatenate([delta_ids[keep], ids])
+        delta = np.concatenate([delta[keep], normalize_rows(vectors)])
+        deleted = _load_npy(_path(name, "deleted.npy"), mmap=False)
+        # Fresh ids (the normal indexing case) need no tombstone
+        replaced = ids[np.isin(ids, _load_npy(_path(name, "ids.npy")))]
+        if len(replaced):
+            deleted = np.union1d(deleted, replaced)
+
+        _save_npy(_path(name, "delta.npy"), delta)
+        _save_npy(_path(name, "delta_ids.npy"), delta_ids)
+        _save_npy(_path(name, "deleted.npy"), deleted)
+        meta["generation"] += 1
+        _write_meta(name, meta)
+        if len(delta_ids) > max(1000, COMPACT_RATIO * meta["count"]):
+            print(f"[VectorStore] {name}: delta has {len(delta_ids)} rows; run build_vector_store --compact")
+
+
+def remove(name, ids):
+    """Tombstone rows (main and delta) so they are no longer returned."""
+    ids = np.asarray(list(ids), dtype=np.int64)
+    if not len(ids):
+        return
+    with _write_lock(name):
+        meta = _read_meta(name)
+        if meta is None:
+            return
+        delta_ids = _load_npy(_path(name, "delta_ids.npy"), mmap=False)
+        delta = _load_npy(_path(name, "delta.npy"), mmap=False)
+        keep = ~np.isin(delta_ids, ids)
+        _save_npy(_path(name, "delta.npy"), delta[keep])
+        _save_npy(_path(name, "delta_ids.npy"), delta_ids[keep])
+        # Delta rows are dropped above; only main-matrix rows need a tombstone
+        in_main = ids[np.isin(ids, _load_npy(_path(name, "ids.npy")))]
+        deleted = np.union1d(_load_npy(_path(name, "deleted.npy"), mmap=False), in_main)
+        _save_npy(_path(name, "deleted.npy"), deleted)
+        meta["generation"] += 1
+        _write_meta(name, meta)
+
+
+def compact(name):
+    """
+    Fold the delta and tombstones back into a freshly built main matrix
+    (k-means again with IVF). Slow; run from build_vector_store --compact,
+    not in a request or indexing path. Returns the row count, or None when
+    the collection was never built.
+    """
+    with _write_lock(name):
+        meta = _read_meta(name)
+        if meta is None:
+            return None
+        ids = _load_npy(_path(name, "ids.npy"))
+        vectors = _load_npy(_path(name, "vectors.npy"))
+        deleted = _load_npy(_path(name, "deleted.npy"), mmap=False)
+        keep = ~np.isin(ids, deleted)
+        ids = np.concatenate([ids[keep], _load_npy(_path(name, "delta_ids.npy"), mmap=False)])
+        vectors = np.concatenate([
+            np.asarray(vectors[keep], dtype=np.float32),
+            _load_npy(_path(name, "delta.npy"), mmap=False),
+        ])
+        _build(name, ids, vectors, meta["dtype"], meta["ivf_lists"])
+    return len(ids)
+
+
+def _dot(matrix, query, block_rows=16384):
+    """
+    matrix @ query as float32. float16 matrices are converted block by block
+    so the BLAS path is used without materializing the whole matrix.
+    """
+    if matrix.dtype == np.float32:
+        return np.asarray(matrix @ query, dtype=np.float32)
+    out = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), block_rows):
+        block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+        out[start:start + block_rows] = block @ query
+    return out
+
+
+class VectorCollection:
+    """Read side of one collection; re-maps its files when the generation changes."""
+
+    def __init__(self, name):
+        self.name = name
+        self.generation = None
+        self._meta_mtime = None
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(_path(self.name, "meta.json")).st_mtime_ns
+        except OSError:
+            self.generation = None
+            return False
+        if mtime == self._meta_mtime:
+            return self.generation is not None
+        meta = _read_meta(self.name)
+        if meta is None:
+            return False
+        self.vectors = _load_npy(_path(self.name, "vectors.npy"))
+        self.ids = _load_npy(_path(self.name, "ids.npy"))
+        self.delta = _load_npy(_path(self.name, "delta.npy"), mmap=False)
+        self.delta_ids = _load_npy(_path(self.name, "delta_ids.npy"), mmap=False)
+        self.deleted = _load_npy(_path(self.name, "deleted.npy"), mmap=False)
+        self.centroids = self.offsets = None
+        if meta.get("ivf_lists"):
+            self.centroids = np.asarray(_load_npy(_path(self.name, "ivf.npy")), dtype=np.float32)
+            self.offsets = _load_npy(_path(self.name, "offsets.npy"), mmap=False)
+        self.generation = meta["generation"]
+        self._meta_mtime = mtime
+        return True
+
+    @property
+    def available(self):
+        return self._refresh()
+
+    def _main_rows(self, query, nprobe):
+        """(row indices, scores) from the main matrix, IVF-limited when built with lists."""
+        if self.centroids is None or not nprobe or nprobe >= len(self.centroids):
+            return np.arange(len(self.ids)), _dot(self.vectors, query)
+        lists = np.argsort(self.centroids @ query)[::-1][:nprobe]
+        rows = np.concatenate([np.arange(self.offsets[k], self.offsets[k + 1]) for k in lists])
+        # Lists are contiguous, so each slice is a sequential read of the mapping
+        scores = np.concatenate([
+            _dot(self.vectors[self.offsets[k]:self.offsets[k + 1]], query) for k in lists
+        ])
+        return rows, scores
+
+    def search(self, query_vec, top_k=10, nprobe=None):
+        """Return [(id, cosine_similarity), ...] best-first, or [] when the store is missing."""
+        if not self._refresh():
+            return []
+        query = normalize_rows(query_vec)[0]
+
+        rows, scores = self._main_rows(query, nprobe)
+        # Over-fetch so tombstoned rows can be dropped without a second pass
+        take = min(len(scores), top_k + len(self.deleted))
+        if take:
+            best = np.argpartition(-scores, take - 1)[:take]
+            main_ids, main_scores = self.ids[rows[best]], scores[best]
+            alive = ~np.isin(main_ids, self.deleted)
+            main_ids, main_scores = main_ids[alive], main_scores[alive]
+        else:
+            main_ids, main_scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        if len(self.delta_ids):
+            main_ids = np.concatenate([main_ids, self.delta_ids])
+            main_scores = np.concatenate([main_scores, self.delta @ query])
+
+        order = np.argsort(-main_scores)[:top_k]
+        return [(int(main_ids[i]), float(main_scores[i])) for i in order]
+
+
+_collections = {}
+
+
+def get_collection(name):
+    if name not in _collections:
+        _collections[name] = VectorCollection(name)
+    return _collections[name]
+
+
+def is_enabled():
+    from staff.utils import get_search_settings
+    return get_search_settings().vector_backend == "numpy"
+
+
+def refresh_paper(paper, chunks=()):
+    """
+    Incrementally push a paper's freshly indexed chunks into the store
+    (no-op when the store was never built).
+    """
+    chunks = [c for c in chunks if c.id is not None]
+    if chunks and _read_meta("chunks") is not None:
+        upsert("chunks", [c.id for c in chunks], [c.embedding for c in chunks])
+
+
+def remove_paper(paper_id):
+    """Drop a paper's chunks from the store (call before deleting it)."""
+    from papers.models import PaperChunk
+
+    if _read_meta("chunks") is not None:
+        remove("chunks", PaperChunk.objects.filter(paper_id=paper_id).values_list("id", flat=True))
+
+
+def remove_chunks(chunk_qs):
+    """Tombstone chunks that are about to be deleted."""
+    if _read_meta("chunks") is not None:
+        remove("chunks", chunk_qs.values_list("id", flat=True))
+
+
+def export_collection(name, dtype="float32", ivf_lists=0):
+    """Export one collection from the database into the store."""
+    from papers.models import PaperChunk
+
+    if name == "chunks":
+        rows = PaperChunk.objects.values_list("id", "embedding").iterator(chunk_size=2000)
+    else:
+        raise ValueError(f"Unknown collection: {name}")
+
+    ids, vectors = [], []
+    for pk, emb in rows:
+        ids.append(pk)
+        vectors.append(np.asarray(emb, dtype=np.float32))
+    build_collection(
+        name, ids, np.vstack(vectors) if vectors else np.zeros((0, DIMENSIONS), dtype=np.float32),
+        dtype=dtype, ivf_lists=ivf_lists,
+    )
+    return len(ids)